@@ -0,0 +1,162 @@
+import glob
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+
+import numpy as np
+
+CHUNK_NAME = re.compile(r"^captures_(\d+)\.npz$")
+
+
+def _next_chunk_idx(directory):
+    # One past the highest existing chunk number, so a deleted chunk never gets overwritten
+    numbers = [int(m.group(1)) for m in map(CHUNK_NAME.match, os.listdir(directory)) if m]
+    return max(numbers) + 1 if numbers else 0
+
+
+class CaptureArchive:
+    """
+    Debug capture store that writes on a background thread.
+
+    Cells are copied and queued by submit(), which never blocks: when the queue
+    is full the capture is dropped and counted. The worker skips cells whose
+    pixels are identical to the last stored capture of the same cell and writes
+    the rest in chunks of `chunk_size` to captures_NNNNN.npz, each holding the
+    images plus an index (col, row, value, timestamp).
+
+    sample_every: keep only every n-th submitted capture
+    max_per_second: rate limit on stored captures (None = no limit)
+    max_bytes: stop writing once the archive directory reaches this size
+    """
+
+    def __init__(self, directory="captures", chunk_size=256, queue_size=512, sample_every=1,
+                 max_per_second=None, max_bytes=None):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.sample_every = max(1, sample_every)
+        self.max_per_second = max_per_second
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self.submitted = 0
+        self.dropped = 0
+        self.duplicates = 0
+        self.rate_limited = 0
+        self.stored = 0
+        self.bytes_written = sum(os.path.getsize(p) for p in glob.glob(os.path.join(directory, "*.npz")))
+        self._chunk_idx = _next_chunk_idx(directory)
+        self._dropped_lock = threading.Lock()  # dropped is counted by submit() and the worker
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._last_hash = {}
+        self._chunk = []
+        self._tokens = float(max_per_second or 0)
+        self._last_refill = time.monotonic()
+        self._thread = threading.Thread(target=self._worker, name="capture-archive", daemon=True)
+        self._thread.start()
+
+    def submit(self, img, value, col_idx=0, row_idx=0, timestamp=None):
+        # Called from the capture thread, must stay cheap
+        self.submitted += 1
+        if (self.submitted - 1) % self.sample_every:
+            return False
+        if not self._take_token():
+            self.rate_limited += 1
+            return False
+        item = (np.array(img), value, col_idx, row_idx, timestamp or time.time())
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+            return False
+        return True
+
+    def _take_token(self):
+        if not self.max_per_second:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self.max_per_second,
+                           self._tokens + (now - self._last_refill) * self.max_per_second)
+        self._last_refill = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._flush()
+                self._queue.task_done()
+                return
+            img, value, col_idx, row_idx, timestamp = item
+            digest = hashlib.blake2b(np.ascontiguousarray(img), digest_size=16).digest()
+            if self._last_hash.get((col_idx, row_idx)) == digest:
+                self.duplicates += 1
+            else:
+                self._last_hash[(col_idx, row_idx)] = digest
+                self._chunk.append(item)
+                if len(self._chunk) >= self.chunk_size:
+                    self._flush()
+            self._queue.task_done()
+
+    def _flush(self):
+        if not self._chunk:
+            return
+        if self.max_bytes is not None and self.bytes_written >= self.max_bytes:
+            with self._dropped_lock:
+                self.dropped += len(self._chunk)
+            self._chunk = []
+            return
+
+        arrays = {f"img_{i}": item[0] for i, item in enumerate(self._chunk)}
+        index = [{"col": c, "row": r, "value": v, "time": t} for _, v, c, r, t in self._chunk]
+        arrays["index"] = np.array(json.dumps(index))
+
+        path = os.path.join(self.directory, f"captures_{self._chunk_idx:05d}.npz")
+        np.savez_compressed(path, **arrays)
+        self._chunk_idx += 1
+        self.stored += len(self._chunk)
+        self.bytes_written += os.path.getsize(path)
+        self._chunk = []
+
+    def close(self):
+        # Writes whatever is still queued, then stops the worker
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self):
+        return {
+            "submitted": self.submitted,
+            "stored": self.stored,
+            "duplicates": self.duplicates,
+            "dropped": self.dropped,
+            "rate_limited": self.rate_limited,
+            "queued": self._queue.qsize(),
+            "bytes_written": self.bytes_written,
+        }
+
+
+def load_archive(directory="captures"):
+    """
+    Yields (img, value, col_idx, row_idx, timestamp) for every stored capture,
+    oldest chunk first.
+    """
+    for path in sorted(glob.glob(os.path.join(directory, "captures_*.npz"))):
+        with np.load(path) as data:
+            index = json.loads(str(data["index"]))
+            for i, entry in enumerate(index):
+                yield data[f"img_{i}"], entry["value"], entry["col"], entry["row"], entry["time"]
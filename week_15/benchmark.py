@@ -0,0 +1,314 @@
+"""
+Synthetic OCR benchmark for the scoreboard readers.
+
+Renders scoreboard cells with known numbers, some with a decimal point, from
+the bundled font (glyphs on a shared baseline via strip_decoder.render_line_glyphs),
+varying number, size, colors, blur and noise, runs
+every recognition engine over them and writes cells/sec, latency percentiles,
+per-stage time and exact-match accuracy to a JSON file.
+
+    python benchmark.py --cells 2000 --out bench_results.json --compare last.json
+"""
+import argparse
+import json
+import os
+import platform
+import time
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+import mm
+from learned_classifier import _random_text
+from strip_decoder import render_line_glyphs
+
+# Text colors used on the scoreboard (see mm.row_color) and a few dark backgrounds
+TEXT_COLORS = [(247, 253, 255), (255, 244, 174)]
+CELL_SIZE = (147, 63)  # same as mm.specs_rect
+
+
+def load_glyph_sets(font_path, font_sizes):
+    """
+    returns: {font_size: {char: uint8 glyph}} for the digits and ".", every glyph
+             cropped to its ink columns and all chars of a size sharing the same
+             rows, so the decimal point sits on the baseline
+    """
+    glyph_sets = {}
+    for font_size in font_sizes:
+        try:
+            glyph_sets[font_size] = render_line_glyphs(font_path, "0123456789.", font_size)
+        except IOError:
+            continue
+    return glyph_sets
+
+
+def render_cell(rng, glyph_sets, blur_max=0.8, noise_max=8.0):
+    """
+    returns: (bgra cell, ground truth text, expected_rgb)
+    """
+    text = _random_text(rng)  # 1-4 digits, about 1 in 5 with a decimal point
+    font_size = rng.choice(list(glyph_sets.keys()))
+    glyphs = glyph_sets[font_size]
+
+    # Lay the chars out next to each other
+    spacing = max(2, font_size // 10)
+    strip = glyphs[text[0]]
+    for char in text[1:]:
+        gap = np.zeros((strip.shape[0], spacing), dtype=np.uint8)
+        strip = np.hstack([strip, gap, glyphs[char]])
+
+    cell_w, cell_h = CELL_SIZE
+    scale = min(1.0, (cell_w - 8) / strip.shape[1], (cell_h - 8) / strip.shape[0])
+    if scale < 1.0:
+        strip = cv2.resize(strip, (max(1, int(strip.shape[1] * scale)), max(1, int(strip.shape[0] * scale))),
+                           interpolation=cv2.INTER_AREA)
+
+    alpha = np.zeros((cell_h, cell_w), dtype=np.float32)
+    h, w = strip.shape
+    y = rng.integers(0, cell_h - h + 1)
+    x = rng.integers(0, min(cell_w - w, 24) + 1)
+    alpha[y:y + h, x:x + w] = strip / 255.0
+
+    expected_rgb = TEXT_COLORS[rng.integers(0, len(TEXT_COLORS))]
+    text_rgb = np.clip(np.array(expected_rgb) + rng.integers(-10, 11, 3), 0, 255)
+    bg_rgb = rng.integers(0, 80, 3)
+    rgb = bg_rgb[None, None, :] * (1 - alpha[:, :, None]) + text_rgb[None, None, :] * alpha[:, :, None]
+
+    sigma = rng.uniform(0, blur_max)
+    if sigma > 0.3:
+        rgb = cv2.GaussianBlur(rgb, (0, 0), sigma)
+    rgb = rgb + rng.normal(0, rng.uniform(0, noise_max), rgb.shape)
+
+    cell = np.empty((cell_h, cell_w, 4), dtype=np.uint8)
+    cell[:, :, :3] = np.clip(rgb[:, :, ::-1], 0, 255)
+    cell[:, :, 3] = 255
+    return cell, text, expected_rgb
+
+
+def make_cells(count, seed=0, font_path=mm.FONT_PATH, font_sizes=(28, 34, 40, 46, 52),
+               blur_max=0.8, noise_max=8.0):
+    rng = np.random.default_rng(seed)
+    glyph_sets = load_glyph_sets(font_path, font_sizes)
+    if not glyph_sets:
+        raise SystemExit(f"Could not render digits from {font_path}")
+    return [render_cell(rng, glyph_sets, blur_max, noise_max) for _ in range(count)]
+
+
+# Engines: factory() returns read(cell, expected_rgb, stages) -> text, or None when unavailable.
+# stages is a dict the engine adds its per-stage seconds to.
+
+def template_engine(classifier=None):
+    mm.init_templates()
+    classifier = classifier or mm.CLASSIFIER
+    if classifier is None:
+        return None
+
+    def read(cell, expected_rgb, stages):
+        t0 = time.perf_counter()
+        thresh = mm.binarize_cell(cell, expected_rgb)
+        t1 = time.perf_counter()
+        char_rois = mm.find_char_rois(thresh)
+        t2 = time.perf_counter()
+        targets = [mm.get_centered_char_image(roi) for x, y, w, h, roi in char_rois]
+        t3 = time.perf_counter()
+        text = "".join(c for c, score in classifier.classify(targets) if score > mm.CONFIDENCE_THRESHOLD)
+        t4 = time.perf_counter()
+        stages["binarize"] += t1 - t0
+        stages["segment"] += t2 - t1
+        stages["normalize"] += t3 - t2
+        stages["classify"] += t4 - t3
+        return text
+    read.classifier = classifier  # for run_batched
+    return read
+
+
+def hamming_engine():
+    # Same pipeline as template_engine, bit-packed XOR + popcount instead of float correlation
+    from glyph_classifier import HammingClassifier
+    mm.init_templates()
+    if not mm.REFERENCE_TEMPLATES:
+        return None
+    return template_engine(HammingClassifier(mm.REFERENCE_TEMPLATES))
+
+
+def learned_engine():
+    # Same pipeline as template_engine, the small net from learned_classifier.py train
+    from learned_classifier import MODEL_PATH, LearnedClassifier
+    if not os.path.exists(MODEL_PATH):
+        return None
+    return template_engine(LearnedClassifier.load(MODEL_PATH))
+
+
+def tesseract_engine():
+    try:
+        mm.pytesseract.get_tesseract_version()
+    except (mm.pytesseract.TesseractNotFoundError, OSError):
+        return None
+
+    def read(cell, expected_rgb, stages):
+        # Same as m.py: grayscale + Otsu, then one tesseract call per cell
+        t0 = time.perf_counter()
+        thresh = mm.binarize_cell(cell)
+        t1 = time.perf_counter()
+        text = mm.read_with_tesseract(thresh)
+        t2 = time.perf_counter()
+        stages["binarize"] += t1 - t0
+        stages["tesseract"] += t2 - t1
+        return text
+    return read
+
+
+def strip_engine():
+    from strip_decoder import StripDecoder
+    try:
+        decoder = StripDecoder.from_font(mm.FONT_PATH)
+    except IOError:
+        return None
+
+    def read(cell, expected_rgb, stages):
+        t0 = time.perf_counter()
+        thresh = mm.binarize_cell(cell, expected_rgb)
+        t1 = time.perf_counter()
+        text = decoder.decode(thresh)
+        t2 = time.perf_counter()
+        stages["binarize"] += t1 - t0
+        stages["decode"] += t2 - t1
+        return text
+    return read
+
+
+ENGINES = {
+    "template": template_engine,
+    "hamming": hamming_engine,
+    "learned": learned_engine,
+    "tesseract": tesseract_engine,
+    "strip": strip_engine,
+}
+
+
+def run_engine(read, cells):
+    stages = defaultdict(float)
+
+    latencies = np.empty(len(cells))
+    correct = 0
+    start = time.perf_counter()
+    for i, (cell, truth, expected_rgb) in enumerate(cells):
+        t = time.perf_counter()
+        text = read(cell, expected_rgb, stages)
+        latencies[i] = time.perf_counter() - t
+        correct += text == truth
+    total = time.perf_counter() - start
+
+    return {
+        "cells": len(cells),
+        "cells_per_sec": len(cells) / total,
+        "latency_ms": {
+            "p50": float(np.percentile(latencies, 50) * 1e3),
+            "p99": float(np.percentile(latencies, 99) * 1e3),
+            "mean": float(latencies.mean() * 1e3),
+        },
+        "stage_ms_per_cell": {k: v / len(cells) * 1e3 for k, v in stages.items()},
+        "accuracy": correct / len(cells),
+    }
+
+
+def frame_glyphs(cells, frame_cells=20):
+    """
+    Normalized glyphs of the cells, grouped frame_cells cells at a time the
+    way ScoreboardReader hands a whole frame to one classify() call.
+    returns: list of glyph lists, one per frame
+    """
+    glyphs = []
+    for cell, truth, expected_rgb in cells:
+        thresh = mm.binarize_cell(cell, expected_rgb)
+        glyphs.append([mm.get_centered_char_image(roi) for x, y, w, h, roi in mm.find_char_rois(thresh)])
+    return [[g for cell_glyphs in glyphs[i:i + frame_cells] for g in cell_glyphs]
+            for i in range(0, len(glyphs), frame_cells)]
+
+
+def run_batched(classifier, frames, repeat=3):
+    # Classifier throughput on whole frames (best of `repeat` passes), masks and normalization excluded
+    count = sum(len(frame) for frame in frames)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for frame in frames:
+            classifier.classify(frame)
+        best = min(best, time.perf_counter() - start)
+    return {
+        "frames": len(frames),
+        "glyphs": count,
+        "glyphs_per_sec": count / best,
+        "ms_per_frame": best / len(frames) * 1e3,
+    }
+
+
+def run_benchmark(engine_names, count=2000, seed=0, blur_max=0.8, noise_max=8.0, frame_cells=20):
+    cells = make_cells(count, seed, blur_max=blur_max, noise_max=noise_max)
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": platform.platform(),
+        "python": platform.python_version(),
+        "seed": seed,
+        "blur_max": blur_max,
+        "noise_max": noise_max,
+        "frame_cells": frame_cells,
+        "engines": {},
+    }
+    frames = None
+    for name in engine_names:
+        read = ENGINES[name]()
+        if read is None:
+            print(f"Skipping {name}: not available")
+            continue
+        results["engines"][name] = run_engine(read, cells)
+        if getattr(read, "classifier", None) is not None:
+            frames = frames or frame_glyphs(cells, frame_cells)
+            results["engines"][name]["batched"] = run_batched(read.classifier, frames)
+    return results
+
+
+def print_results(results, previous=None):
+    for name, r in results["engines"].items():
+        line = (f"{name:<12} {r['cells_per_sec']:>9.1f} cells/s  p50 {r['latency_ms']['p50']:.3f} ms  "
+                f"p99 {r['latency_ms']['p99']:.3f} ms  accuracy {r['accuracy'] * 100:.1f}%")
+        old = (previous or {}).get("engines", {}).get(name)
+        if old:
+            line += (f"  ({(r['cells_per_sec'] / old['cells_per_sec'] - 1) * 100:+.1f}% speed, "
+                     f"{(r['accuracy'] - old['accuracy']) * 100:+.1f} pts accuracy)")
+        print(line)
+        stages = "  ".join(f"{k} {v:.3f}" for k, v in r["stage_ms_per_cell"].items())
+        print(f"{'':<12} ms/cell: {stages}")
+        batched = r.get("batched")
+        if batched:
+            line = (f"{'':<12} frames of {results['frame_cells']} cells: {batched['glyphs_per_sec']:.0f} glyphs/s "
+                    f"classify, {batched['ms_per_frame']:.3f} ms/frame")
+            old_batched = (old or {}).get("batched")
+            if old_batched:
+                line += f"  ({(batched['glyphs_per_sec'] / old_batched['glyphs_per_sec'] - 1) * 100:+.1f}%)"
+            print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic scoreboard OCR benchmark")
+    parser.add_argument("--cells", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--blur", type=float, default=0.8, help="max gaussian blur sigma")
+    parser.add_argument("--noise", type=float, default=8.0, help="max noise std dev")
+    parser.add_argument("--frame-cells", type=int, default=20, help="cells per batched classify call")
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES))
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.engines, args.cells, args.seed, args.blur, args.noise, args.frame_cells)
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_results(results, previous)
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.out}")
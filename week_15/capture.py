@@ -0,0 +1,41 @@
+import numpy as np
+
+
+def board_region(columns, rows, rect):
+    """
+    columns: list of cell x starts
+    rows: list of cell y starts
+    rect: (width, height) of one cell
+    returns: mss region covering every cell
+    """
+    left = min(columns)
+    top = min(rows)
+    right = max(columns) + rect[0]
+    bottom = max(rows) + rect[1]
+    return {"top": top, "left": left, "width": right - left, "height": bottom - top}
+
+
+def frame_from_screenshot(sct_img):
+    # Wrap the raw BGRA buffer, np.array(sct_img) would copy it
+    return np.frombuffer(sct_img.raw, dtype=np.uint8).reshape(sct_img.height, sct_img.width, 4)
+
+
+def grab_frame(sct, region):
+    # One grab for the whole region, returned as a (h, w, 4) BGRA view
+    return frame_from_screenshot(sct.grab(region))
+
+
+def cell_views(frame, region, columns, rows, rect):
+    """
+    Slices every cell out of a frame grabbed with board_region().
+    returns: cells[row_idx][col_idx] as views into frame (no copies)
+    """
+    cells = []
+    for row_start in rows:
+        y = row_start - region["top"]
+        row_cells = []
+        for col_start in columns:
+            x = col_start - region["left"]
+            row_cells.append(frame[y:y + rect[1], x:x + rect[0]])
+        cells.append(row_cells)
+    return cells
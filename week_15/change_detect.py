@@ -0,0 +1,77 @@
+import hashlib
+import threading
+
+import cv2
+import numpy as np
+
+
+class CellChangeDetector:
+    """
+    Remembers the last binarized mask of every cell and the value decoded from it.
+
+    tolerance == 0: masks are compared by a content hash (exact match)
+    tolerance > 0: masks are downsampled by `scale` and count as unchanged while
+                   the mean absolute difference stays under tolerance (0..1)
+    """
+
+    def __init__(self, tolerance=0.0, scale=4):
+        self.tolerance = tolerance
+        self.scale = scale
+        self.hits = 0
+        self.misses = 0
+        self._cells = {}    # key -> (signature, value)
+        self._pending = {}  # key -> signature of the last miss, waiting for its value
+        self._lock = threading.Lock()
+
+    def _signature(self, mask):
+        if self.tolerance <= 0:
+            return hashlib.blake2b(np.ascontiguousarray(mask), digest_size=16).digest()
+        h, w = mask.shape
+        small = cv2.resize(mask, (max(1, w // self.scale), max(1, h // self.scale)),
+                           interpolation=cv2.INTER_AREA)
+        return small.astype(np.float32) / 255.0
+
+    def _same(self, old, new):
+        if self.tolerance <= 0:
+            return old == new
+        return old.shape == new.shape and float(np.abs(old - new).mean()) <= self.tolerance
+
+    def check(self, key, mask):
+        """
+        key: anything hashable identifying the cell, e.g. (row_idx, col_idx)
+        mask: binarized cell
+        returns: last decoded value if the cell did not change, else None
+                 (call store() with the new value afterwards)
+        """
+        signature = self._signature(mask)
+        with self._lock:
+            entry = self._cells.get(key)
+            if entry is not None and self._same(entry[0], signature):
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            self._pending[key] = signature
+        return None
+
+    def store(self, key, value):
+        with self._lock:
+            signature = self._pending.pop(key, None)
+            if signature is not None:
+                self._cells[key] = (signature, value)
+
+    def forget(self, key=None):
+        # Drop one cell (or all cells) so the next check is a miss
+        with self._lock:
+            if key is None:
+                self._cells.clear()
+                self._pending.clear()
+            else:
+                self._cells.pop(key, None)
+                self._pending.pop(key, None)
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate()}
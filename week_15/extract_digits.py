@@ -1,43 +1,127 @@
 from PIL import Image, ImageFont, ImageDraw
 import os
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
+from template_bank import cached_bank
 
-def extract_digits_from_font(font_path, output_dir=None, image_size=(200, 200), font_size=150, shift=(0,0)):
+def render_size(font_path, chars, image_size, font_size, shifts):
+    """
+    Renders every char once at font_size and cuts each shift out of that render.
+    Shifts are whole pixels, so moving the crop window is the same as drawing
+    the text shifted (the canvas is padded so nothing gets clipped differently).
+    returns: (len(shifts), len(chars), height, width) uint8
+    """
+    font = ImageFont.truetype(font_path, font_size)
+    w, h = image_size
+    pad = max([abs(v) for shift in shifts for v in shift] + [0])
+    glyphs = np.zeros((len(shifts), len(chars), h, w), dtype=np.uint8)
+
+    for c, char in enumerate(chars):
+        image = Image.new("L", (w + 2 * pad, h + 2 * pad), color=0)
+        draw = ImageDraw.Draw(image)
+
+        # Center the text in the unpadded canvas
+        bbox = draw.textbbox((0, 0), char, font=font)
+        x = (w - (bbox[2] - bbox[0])) / 2 - bbox[0]
+        y = (h - (bbox[3] - bbox[1])) / 2 - bbox[1]
+        draw.text((x + pad, y + pad), char, font=font, fill=255)
+
+        rendered = np.asarray(image)
+        for s, (dx, dy) in enumerate(shifts):
+            glyphs[s, c] = rendered[pad - dy:pad - dy + h, pad - dx:pad - dx + w]
+    return glyphs
+
+class GlyphAtlas:
+    """
+    Every char rendered at every (font_size, shift) of a grid, in one array:
+    glyphs[size_idx, shift_idx, char_idx] is an (height, width) uint8 image.
+    """
+
+    def __init__(self, glyphs, chars, font_sizes, shifts, image_size):
+        self.glyphs = glyphs
+        self.chars = chars
+        self.font_sizes = list(font_sizes)
+        self.shifts = [tuple(shift) for shift in shifts]
+        self.image_size = tuple(image_size)
+
+    def get(self, font_size, shift=(0, 0)):
+        # returns: dict char -> glyph (views into the atlas), like render_digits
+        plane = self.glyphs[self.font_sizes.index(font_size), self.shifts.index(tuple(shift))]
+        return dict(zip(self.chars, plane))
+
+    def tile(self):
+        # One 2D image: a row per (font_size, shift), a column per char
+        n_sizes, n_shifts, n_chars, h, w = self.glyphs.shape
+        return self.glyphs.reshape(n_sizes * n_shifts, n_chars, h, w).transpose(0, 2, 1, 3).reshape(
+            n_sizes * n_shifts * h, n_chars * w)
+
+    def save(self, path):
+        # .npz keeps the grid, anything else is written as the tiled image
+        if path.endswith(".npz"):
+            np.savez_compressed(path, glyphs=self.glyphs, chars=np.array(list(self.chars)),
+                                font_sizes=np.array(self.font_sizes), shifts=np.array(self.shifts),
+                                image_size=np.array(self.image_size))
+        else:
+            Image.fromarray(self.tile()).save(path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["glyphs"], data["chars"].tolist(), data["font_sizes"].tolist(),
+                       data["shifts"].tolist(), data["image_size"].tolist())
+
+def render_atlas(font_path, chars="0123456789", image_size=(200, 200), font_sizes=(150,),
+                 shifts=((0, 0),), workers=None, output_path=None):
+    """
+    Renders chars over the whole font_sizes x shifts grid in one call, one
+    font size per task on a process pool (workers=1 renders in this process).
+    output_path: optionally write the atlas as one .npz (or tiled .png) file
+    returns: GlyphAtlas
+    Raises IOError if the font cannot be opened.
+    """
+    shifts = [tuple(shift) for shift in shifts]
+    font_sizes = list(font_sizes)
+    workers = min(workers or os.cpu_count() or 1, len(font_sizes))
+    n = len(font_sizes)
+    args = ([font_path] * n, [chars] * n, [image_size] * n, font_sizes, [shifts] * n)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            planes = list(pool.map(render_size, *args))
+    else:
+        planes = list(map(render_size, *args))
+
+    atlas = GlyphAtlas(np.stack(planes), chars, font_sizes, shifts, image_size)
+    if output_path:
+        atlas.save(output_path)
+    return atlas
+
+def render_digits(font_path, image_size=(200, 200), font_size=150, shift=(0,0), digits="0123456789"):
+    return {digit: glyph.copy() for digit, glyph in
+            zip(digits, render_size(font_path, digits, image_size, font_size, [shift])[0])}
+
+def extract_digits_from_font(font_path, output_dir=None, image_size=(200, 200), font_size=150, shift=(0,0), use_cache=True):
     if output_dir and not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
+    digits = "0123456789"
     try:
-        font = ImageFont.truetype(font_path, font_size)
+        if use_cache:
+            # Rendered once per font file / size / canvas / shift, then loaded from .template_cache
+            cached = cached_bank("extract_digits", font_path, digits,
+                                 lambda: render_digits(font_path, image_size, font_size, shift, digits),
+                                 image_size=image_size, font_size=font_size, shift=shift)
+            results = {digit: np.array(img) for digit, img in cached.items()}
+        else:
+            results = render_digits(font_path, image_size, font_size, shift, digits)
     except IOError:
         print(f"Error: Cannot open font resource at {font_path}")
         return {}
 
-    digits = "0123456789"
-    results = {}
-
-    for digit in digits:
-        # Create a new image with a white background
-        image = Image.new("L", image_size, color=0) # White background
-        draw = ImageDraw.Draw(image)
-
-        # Calculate text position to center it
-        bbox = draw.textbbox((0, 0), digit, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        
-        # Center the text
-        x = (image_size[0] - text_width) / 2 - bbox[0]
-        y = (image_size[1] - text_height) / 2 - bbox[1]
-
-        draw.text((x + shift[0], y + shift[1]), digit, font=font, fill=255) # Black text
-        
-        # Convert PIL image to OpenCV format (numpy array)
-        cv2_img = np.array(image)
-        results[digit] = cv2_img
-
-        if output_dir:
+    if output_dir:
+        for digit, img in results.items():
             output_path = os.path.join(output_dir, f"{digit}.png")
-            image.save(output_path)
+            Image.fromarray(img).save(output_path)
             #print(f"Saved {output_path}")
 
     return results
@@ -47,3 +131,7 @@ if __name__ == "__main__":
     output_directory = "digit_imgs"
     
     extract_digits_from_font(font_file, output_directory)
+
+    # Whole sweep of the notebook (sizes x shifts) as one file
+    render_atlas(font_file, "0123456789.", image_size=(63, 63), font_sizes=range(40, 72, 2),
+                 shifts=[(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)], output_path="digit_atlas.npz")
@@ -0,0 +1,302 @@
+"""
+Shared-memory frame bus: grab the board once, read it from any number of processes.
+
+A capture daemon (serve()) grabs the board region on a fixed schedule and
+publishes every frame into a multiprocessing.shared_memory ring buffer.
+Consumers (the live OCR, a recorder, a debug viewer) attach by name and get
+numpy views straight into the buffer: nothing is pickled, copied or grabbed
+again, however many consumers there are.
+
+Layout of the block: an int64 header, per-slot sequence numbers and grab
+times, then `slots` frames of (height, width, 4) BGRA. The writer marks a
+slot as being written (seq -1), copies the frame in, stamps it and then
+advances `latest`. A consumer's view stays valid until the writer comes
+around to that slot again, slots - 1 frames later; BusFrame.valid() tells
+whether that already happened (copy the frame if you need it for longer).
+
+    python frame_bus.py serve --hz 10        # the only process that grabs
+    python frame_bus.py ocr                  # any number of consumers
+    python frame_bus.py view
+"""
+import argparse
+import os
+import time
+from collections import namedtuple
+from multiprocessing import resource_tracker, shared_memory
+
+import cv2
+import mss
+import numpy as np
+
+import mm
+from capture import board_region, grab_frame
+from timing import FixedRate
+
+BUS_NAME = "scoreboard_frames"
+MAGIC = 0x5342465242  # "SBFRB"
+# Header fields (int64 each)
+H_MAGIC, H_SLOTS, H_HEIGHT, H_WIDTH, H_LEFT, H_TOP, H_LATEST, H_CLOSED, H_PID, H_TRACKER = range(10)
+HEADER_FIELDS = 10
+DATA_ALIGN = 64
+
+
+def _data_offset(slots):
+    meta = (HEADER_FIELDS + 2 * slots) * 8
+    return -(-meta // DATA_ALIGN) * DATA_ALIGN
+
+
+def _tracker_pid():
+    # pid of the resource tracker this process started or was forked with, 0 if none / not posix
+    return getattr(resource_tracker._resource_tracker, "_pid", None) or 0
+
+
+def _shares_writer_tracker(header):
+    # Consumers forked from the writer (or spawned by it) talk to the writer's
+    # resource tracker; it keeps one entry per block, so unregistering there
+    # would drop the writer's own registration
+    tracker = resource_tracker._resource_tracker
+    if tracker._pid is not None:
+        return tracker._pid == header[H_TRACKER]
+    return os.getppid() == header[H_PID]
+
+
+def _views(buf, slots, height, width):
+    # returns: header, slot seqs, slot times, frames (slots, height, width, 4), all views into buf
+    header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=buf)
+    seqs = np.ndarray((slots,), dtype=np.int64, buffer=buf, offset=HEADER_FIELDS * 8)
+    times = np.ndarray((slots,), dtype=np.float64, buffer=buf, offset=(HEADER_FIELDS + slots) * 8)
+    frames = np.ndarray((slots, height, width, 4), dtype=np.uint8, buffer=buf, offset=_data_offset(slots))
+    return header, seqs, times, frames
+
+
+# seq: frame number from 1, time: wall clock of the grab, frame: (h, w, 4) BGRA view into the bus
+class BusFrame(namedtuple("BusFrame", ["seq", "time", "frame", "bus"])):
+    def valid(self):
+        # False once the writer has started overwriting this frame's slot
+        return self.bus.slot_seq(self.seq) == self.seq
+
+
+class FrameBusWriter:
+    """
+    region: mss style dict of what is published (frames must be its size)
+    slots: ring size, how many frames a slow consumer can fall behind
+    """
+
+    def __init__(self, region, slots=8, name=BUS_NAME):
+        self.region = region
+        self.slots = slots
+        self.name = name
+        height, width = region["height"], region["width"]
+        size = _data_offset(slots) + slots * height * width * 4
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left over from a daemon that didn't shut down cleanly
+            print(f"Warning: replacing existing frame bus {name}.")
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        self._header, self._seqs, self._times, self._frames = _views(self.shm.buf, slots, height, width)
+        self._seqs[:] = 0
+        self._header[:] = [MAGIC, slots, height, width, region["left"], region["top"], 0, 0, os.getpid(),
+                           _tracker_pid()]
+        self.published = 0
+
+    def publish(self, frame, timestamp=None):
+        # Copies one (h, w, 4) frame into the next slot, returns its sequence number
+        seq = self.published + 1
+        slot = seq % self.slots
+        self._seqs[slot] = -1
+        np.copyto(self._frames[slot], frame)
+        self._times[slot] = timestamp if timestamp is not None else time.time()
+        self._seqs[slot] = seq
+        self._header[H_LATEST] = seq
+        self.published = seq
+        return seq
+
+    def close(self):
+        self._header[H_CLOSED] = 1
+        self._header = self._seqs = self._times = self._frames = None
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FrameBusReader:
+    """
+    Attaches to a running bus. next_frame() / iterating returns frames in
+    order; a consumer that falls more than half the ring behind jumps to the
+    newest frame and counts the skipped ones in `missed`.
+    """
+
+    def __init__(self, name=BUS_NAME):
+        self.shm = shared_memory.SharedMemory(name=name)
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+        if os.name == "posix" and not _shares_writer_tracker(header):
+            # Attaching registers the block with this process' resource tracker,
+            # which would unlink it when we exit; only the writer owns it
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        if header[H_MAGIC] != MAGIC:
+            self.shm.close()
+            raise ValueError(f"{name} is not a frame bus")
+        self.slots, height, width = int(header[H_SLOTS]), int(header[H_HEIGHT]), int(header[H_WIDTH])
+        self.region = {"top": int(header[H_TOP]), "left": int(header[H_LEFT]), "width": width, "height": height}
+        self._header, self._seqs, self._times, self._frames = _views(self.shm.buf, self.slots, height, width)
+        self.last_seq = int(self._header[H_LATEST])  # start with the next new frame
+        self.read = 0
+        self.missed = 0
+        self.stale = 0  # frames overwritten while read_bus() recognized them
+
+    @property
+    def closed(self):
+        return self._header is None or bool(self._header[H_CLOSED])
+
+    def latest_seq(self):
+        return int(self._header[H_LATEST])
+
+    def slot_seq(self, seq):
+        return int(self._seqs[seq % self.slots])
+
+    def _get(self, seq):
+        # returns: BusFrame for seq, None if its slot has moved on
+        slot = seq % self.slots
+        timestamp = float(self._times[slot])
+        if self._seqs[slot] != seq:
+            return None
+        return BusFrame(seq, timestamp, self._frames[slot], self)
+
+    def latest(self):
+        # Newest complete frame (None before the first one), for consumers that only want the current state
+        seq = self.latest_seq()
+        while seq > 0:
+            item = self._get(seq)
+            if item is not None:
+                self.last_seq = seq
+                return item
+            seq -= 1
+        return None
+
+    def next_frame(self, timeout=None, poll=0.002):
+        """
+        Blocks until the frame after the last one returned is published.
+        returns: BusFrame, None on timeout or when the writer closed the bus
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            latest = self.latest_seq()
+            if latest > self.last_seq:
+                seq = self.last_seq + 1
+                if latest - seq >= self.slots // 2:
+                    # More than half the ring behind, the slot will be overwritten
+                    # soon: catch up to the newest frame instead
+                    seq = latest
+                self.missed += seq - self.last_seq - 1
+                item = self._get(seq)
+                if item is not None:
+                    self.last_seq = seq
+                    self.read += 1
+                    return item
+                # Overwritten while we looked, take the newest instead
+                self.missed += 1
+                self.last_seq = seq
+                continue
+            if self.closed or (deadline is not None and time.monotonic() >= deadline):
+                return None
+            time.sleep(poll)
+
+    def __iter__(self):
+        while True:
+            item = self.next_frame()
+            if item is None:
+                return
+            yield item
+
+    def stats(self):
+        return {"read": self.read, "missed": self.missed, "stale": self.stale, "latest": self.latest_seq(), "slots": self.slots}
+
+    def close(self):
+        self._header = self._seqs = self._times = self._frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # a BusFrame is still referenced, the mapping goes away with the process
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def serve(region=None, hz=10.0, slots=8, name=BUS_NAME, max_frames=None, sct=None):
+    """
+    The capture daemon: grabs `region` (default: the reader's board region)
+    at hz and publishes it, until interrupted or max_frames.
+    """
+    region = region or board_region(mm.specs_columns, mm.specs_rows, mm.specs_rect)
+    own_sct = sct is None
+    sct = sct or mss.mss()
+    period = 1.0 / hz
+    try:
+        with FrameBusWriter(region, slots, name) as bus:
+            schedule = FixedRate()
+            while max_frames is None or bus.published < max_frames:
+                grabbed = time.time()
+                bus.publish(grab_frame(sct, region), grabbed)
+                schedule.wait(period)
+    finally:
+        if own_sct:
+            sct.close()
+
+
+def read_bus(bus, reader=None):
+    """
+    The live OCR as a bus consumer.
+    reader: ScoreboardReader placed on the bus' region (default placement by default)
+    yields: (BusFrame, values) per frame; frames the writer overwrote while
+            they were being read are dropped and counted in bus.stale
+    """
+    reader = reader or mm.ScoreboardReader()
+    if (reader.region["width"], reader.region["height"]) != (bus.region["width"], bus.region["height"]):
+        raise ValueError(f"Reader region {reader.region} doesn't match the bus region {bus.region}")
+    for item in bus:
+        values = reader.read_frame(item.frame)
+        if not item.valid():
+            # Recognized from a half overwritten frame, the next one is newer anyway
+            bus.stale += 1
+            continue
+        yield item, values
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared-memory frame bus for scoreboard consumers")
+    parser.add_argument("command", choices=["serve", "ocr", "view"])
+    parser.add_argument("--name", default=BUS_NAME)
+    parser.add_argument("--hz", type=float, default=10.0)
+    parser.add_argument("--slots", type=int, default=8)
+    args = parser.parse_args()
+
+    try:
+        if args.command == "serve":
+            print(f"Publishing to {args.name} at {args.hz} Hz (pid {os.getpid()})")
+            serve(hz=args.hz, slots=args.slots, name=args.name)
+        elif args.command == "ocr":
+            with FrameBusReader(args.name) as bus:
+                for item, values in read_bus(bus):
+                    mm.print_board(values)
+        else:
+            with FrameBusReader(args.name) as bus:
+                for item in bus:
+                    cv2.imshow(args.name, item.frame)
+                    if cv2.waitKey(1) == 27:
+                        break
+                cv2.destroyAllWindows()
+    except KeyboardInterrupt:
+        pass
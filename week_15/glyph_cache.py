@@ -0,0 +1,79 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class GlyphCache:
+    """
+    Bounded LRU cache from a glyph ROI to its (char, score).
+
+    Keys are a hash of the raw ROI mask plus its shape, so the same bitmap
+    seen in another cell or a later frame skips normalization and
+    classification. One cache belongs to one classifier and threshold setup,
+    clear() it when the templates change. Safe to share between threads.
+    """
+
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(roi):
+        digest = hashlib.blake2b(np.ascontiguousarray(roi), digest_size=16)
+        digest.update(np.array(roi.shape, dtype=np.int32).tobytes())
+        return digest.digest()
+
+    def get(self, key):
+        # returns: cached (char, score) or None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, result):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def classify(self, rois, classify):
+        """
+        rois: raw glyph masks
+        classify: fn(list of rois) -> [(char, score)], only called with the misses (once)
+        returns: [(char, score)] for every roi
+        """
+        keys = [self.key(roi) for roi in rois]
+        results = [self.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            for i, result in zip(missing, classify([rois[i] for i in missing])):
+                results[i] = result
+                self.put(keys[i], result)
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {"size": len(self), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": self.hit_rate()}
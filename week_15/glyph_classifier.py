@@ -0,0 +1,256 @@
+from functools import lru_cache
+
+import numpy as np
+
+
+def _unit_rows(matrix):
+    # Scale every row to length 1, all-zero rows stay zero (cv2 gives 0 for those too)
+    norms = np.sqrt(np.einsum('ij,ij->i', matrix, matrix))
+    norms[norms == 0] = 1.0
+    return matrix / norms[:, None]
+
+
+def stack_glyphs(glyphs):
+    # glyphs: list of equally sized 2D arrays or an (n, h, w) array
+    # returns: (n, h*w) float32 matrix
+    if len(glyphs) == 0:
+        return np.zeros((0, 0), dtype=np.float32)
+    stacked = np.asarray(glyphs) if isinstance(glyphs, np.ndarray) else np.stack(glyphs)
+    return stacked.reshape(len(stacked), -1).astype(np.float32)
+
+
+class CorrelationClassifier:
+    """
+    Template bank as one pre-normalized matrix (one row per template).
+
+    For same-size images cv2.matchTemplate(target, template, cv2.TM_CCORR_NORMED)
+    is just sum(T*I) / sqrt(sum(T^2) * sum(I^2)), so normalizing both sides
+    once turns the per-glyph, per-template loop into one matrix product.
+    """
+
+    def __init__(self, templates):
+        # templates: dict char -> normalized glyph (e.g. 32x32 uint8), or a list of
+        # (char, glyph) pairs when a char has several templates (fonts / sizes)
+        entries = list(templates.items()) if isinstance(templates, dict) else list(templates)
+        self.chars = [char for char, _ in entries]
+        self.shape = entries[0][1].shape if entries else (0, 0)
+        self.matrix = _unit_rows(stack_glyphs([glyph for _, glyph in entries]))
+
+    def __len__(self):
+        return len(self.chars)
+
+    def score_matrix(self, glyphs):
+        # returns: (n_glyphs, n_templates) TM_CCORR_NORMED scores
+        rois = stack_glyphs(glyphs)
+        if len(rois) == 0:
+            return np.zeros((0, len(self.chars)), dtype=np.float32)
+        return _unit_rows(rois) @ self.matrix.T
+
+    def classify(self, glyphs):
+        # returns: list of (best_char, score), one per glyph, in input order
+        scores = self.score_matrix(glyphs)
+        if scores.shape[0] == 0:
+            return []
+        # argmax keeps the first maximum, same as the old "score > best_score" loop
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(best)), best]
+        return [(self.chars[i], float(s)) for i, s in zip(best, best_scores)]
+
+
+BIT_THRESHOLD = 128  # normalized glyphs are anti-aliased by the resize, >= this counts as ink
+
+# numpy >= 2.0 has a popcount ufunc, older versions count bytes through a table
+_BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(words):
+    # words: uint64 array -> per-element bit counts
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    return _BYTE_POPCOUNT[words.view(np.uint8)].reshape(words.shape + (8,)).sum(axis=-1)
+
+
+@lru_cache(maxsize=None)
+def _rsqrt_table(pixels):
+    # 1 / sqrt(ink) for every ink count 0..pixels, shared by all banks of one glyph size;
+    # a glyph without ink has |A and B| = 0, max() only avoids the 0 / 0
+    table = 1 / np.sqrt(np.maximum(np.arange(pixels + 1, dtype=np.float32), 1))
+    table.flags.writeable = False
+    return table
+
+
+def pack_glyphs(glyphs):
+    """
+    glyphs: list / stack of equally sized normalized glyphs
+    returns: (n, words) uint64, one bit per pixel (ink = 1), zero padded to whole words
+    """
+    if len(glyphs) == 0:
+        return np.zeros((0, 0), dtype=np.uint64)
+    stacked = np.asarray(glyphs) if isinstance(glyphs, np.ndarray) else np.stack(glyphs)
+    bits = np.packbits(stacked.reshape(len(stacked), -1) >= BIT_THRESHOLD, axis=1)
+    pad = -bits.shape[1] % 8
+    if pad:
+        bits = np.pad(bits, ((0, 0), (0, pad)))
+    return np.ascontiguousarray(bits).view(np.uint64)
+
+
+class HammingClassifier:
+    """
+    Template bank as packed bits, 1 bit per pixel instead of a float32 row.
+
+    For binary images TM_CCORR_NORMED is |A and B| / sqrt(|A| |B|), so
+    scores are an AND + popcount per word, the correlation of the
+    thresholded glyphs, and keep the same meaning for CONFIDENCE_THRESHOLD.
+    distance_matrix() gives the Hamming distances (XOR + popcount), which
+    relate as |A and B| = (|A| + |B| - |A xor B|) / 2. Same interface as
+    CorrelationClassifier.
+    """
+
+    def __init__(self, templates):
+        entries = list(templates.items()) if isinstance(templates, dict) else list(templates)
+        self.chars = [char for char, _ in entries]
+        self.shape = entries[0][1].shape if entries else (0, 0)
+        bits = pack_glyphs([glyph for _, glyph in entries])
+        # Bank plus one all-ink row: ANDed with it a glyph's popcount is its own ink,
+        # so one popcount pass gives both |A and B| and |A|
+        self._bank = np.vstack([bits, np.full((1, bits.shape[1]), ~np.uint64(0), dtype=np.uint64)])
+        self.bits = self._bank[:-1]
+        # 1 / sqrt(|A| |B|) = rsqrt(|A|) * rsqrt(|B|): a shared table for the glyph side,
+        # one float per template for the other
+        self._rsqrt = _rsqrt_table(bits.shape[1] * 64)
+        self._template_rsqrt = self._rsqrt[_popcount(bits).sum(axis=1)]
+
+    def __len__(self):
+        return len(self.chars)
+
+    @property
+    def nbytes(self):
+        # Per-bank state: packed bits (plus the all-ink row) and the template norms
+        return self._bank.nbytes + self._template_rsqrt.nbytes
+
+    def _distances(self, bits):
+        return _popcount(bits[:, None, :] ^ self.bits[None, :, :]).sum(axis=2)
+
+    def distance_matrix(self, glyphs):
+        # returns: (n_glyphs, n_templates) Hamming distances
+        return self._distances(pack_glyphs(glyphs))
+
+    def score_matrix(self, glyphs):
+        # returns: (n_glyphs, n_templates) TM_CCORR_NORMED of the binarized glyphs
+        if len(glyphs) == 0:
+            return np.zeros((0, len(self.chars)), dtype=np.float32)
+        counts = _popcount(pack_glyphs(glyphs)[:, None, :] & self._bank[None, :, :]).sum(axis=2, dtype=np.int32)
+        scores = np.multiply(counts[:, :-1], self._template_rsqrt, dtype=np.float32)
+        scores *= self._rsqrt[counts[:, -1]][:, None]
+        return scores
+
+    def classify(self, glyphs):
+        # returns: list of (best_char, score), one per glyph, in input order
+        scores = self.score_matrix(glyphs)
+        if scores.shape[0] == 0:
+            return []
+        chars = self.chars
+        return [(chars[i], s) for i, s in zip(scores.argmax(axis=1).tolist(), scores.max(axis=1).tolist())]
+
+
+# Engines selectable by name (mm.CLASSIFIER_ENGINE), all take the template dict / pairs
+CLASSIFIERS = {
+    "correlation": CorrelationClassifier,
+    "hamming": HammingClassifier,
+}
+
+
+def _reference_classify(glyphs, templates):
+    # The original per-template cv2 loop from mm.py, kept for checking
+    import cv2
+    results = []
+    for target in glyphs:
+        best_score = -1
+        best_char = ""
+        for char, template in templates.items():
+            score = cv2.matchTemplate(target, template, cv2.TM_CCORR_NORMED)[0][0]
+            if score > best_score:
+                best_score = score
+                best_char = char
+        results.append((best_char, float(best_score)))
+    return results
+
+
+def check_equivalence(templates, glyphs, tolerance=1e-4):
+    # Compares the batched scores with the cv2 loop, returns number of mismatches
+    classifier = CorrelationClassifier(templates)
+    scores = classifier.score_matrix(glyphs)
+    fast = classifier.classify(glyphs)
+    slow = _reference_classify(glyphs, templates)
+    mismatches = 0
+    for i, ((fast_char, fast_score), (slow_char, slow_score)) in enumerate(zip(fast, slow)):
+        if abs(fast_score - slow_score) > tolerance:
+            mismatches += 1
+        elif fast_char != slow_char:
+            # Only acceptable if the two candidates are tied within float error
+            slow_idx = classifier.chars.index(slow_char)
+            if abs(scores[i, slow_idx] - fast_score) > tolerance:
+                mismatches += 1
+    return mismatches
+
+
+if __name__ == "__main__":
+    import cv2
+    import time
+    import mm
+
+    mm.init_templates()
+    templates = mm.REFERENCE_TEMPLATES
+    if not templates:
+        raise SystemExit("No templates, run from week_15 so the font can be found")
+
+    # Real templates plus shifted / noisy / eroded versions of them
+    rng = np.random.default_rng(0)
+    glyphs = []
+    for template in templates.values():
+        glyphs.append(template)
+        glyphs.append(np.roll(template, rng.integers(-3, 4), axis=1))
+        noisy = template.copy()
+        noisy[rng.random(template.shape) < 0.05] = 255
+        glyphs.append(noisy)
+        glyphs.append(cv2.erode(template, np.ones((2, 2), np.uint8)))
+    glyphs += [rng.integers(0, 2, (32, 32), dtype=np.uint8) * 255 for _ in range(50)]
+
+    mismatches = check_equivalence(templates, glyphs)
+    print(f"{len(glyphs)} glyphs, {mismatches} mismatches against TM_CCORR_NORMED")
+    if mismatches:
+        # Regression check: the batched scores must match the cv2 loop
+        raise SystemExit(1)
+
+    classifier = CorrelationClassifier(templates)
+    start = time.perf_counter()
+    for _ in range(100):
+        classifier.classify(glyphs)
+    fast_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(100):
+        _reference_classify(glyphs, templates)
+    slow_time = time.perf_counter() - start
+    print(f"batched: {fast_time * 10:.3f} ms/frame, cv2 loop: {slow_time * 10:.3f} ms/frame")
+
+    # Big bank: every size from 12 to 96 px, still one matrix product
+    from template_bank import load_multi_templates
+    bank = CorrelationClassifier(load_multi_templates([mm.FONT_PATH], sizes=range(12, 97, 1)))
+    start = time.perf_counter()
+    for _ in range(100):
+        bank.classify(glyphs)
+    print(f"{len(bank)} templates: {(time.perf_counter() - start) * 10:.3f} ms/frame")
+
+    # Bit-packed engine on the same glyphs, against TM_CCORR_NORMED on the uint8 glyphs
+    hamming = HammingClassifier(templates)
+    exact = classifier.classify(glyphs)
+    packed = hamming.classify(glyphs)
+    agree = sum(a[0] == b[0] for a, b in zip(exact, packed))
+    start = time.perf_counter()
+    for _ in range(100):
+        hamming.classify(glyphs)
+    hamming_time = time.perf_counter() - start
+    print(f"hamming agrees with TM_CCORR_NORMED on {agree}/{len(glyphs)} glyphs, "
+          f"{hamming_time * 10:.3f} ms/frame (correlation {fast_time * 10:.3f}), "
+          f"templates {hamming.nbytes} bytes vs {len(hamming) * 32 * 32} as uint8 "
+          f"({classifier.matrix.nbytes} as the float32 matrix)")
@@ -0,0 +1,238 @@
+"""
+Resolution independent board layout.
+
+The board is described in relative coordinates: its bounding box as
+fractions of the monitor, the cells as fractions of the board. place()
+scales that to any monitor from m.list_monitors() / sct.monitors.
+
+When the plain scaling is off (different aspect ratio, UI scale setting),
+calibrate() finds the board once with a coarse-to-fine pyramid search for a
+reference capture of it and caches the result per resolution, so capturing
+afterwards only uses the cached absolute rectangles.
+
+    placement = calibrate(sct, sct.monitors[1])
+    reader = ScoreboardReader(*placement)
+"""
+import json
+import os
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from capture import board_region, frame_from_screenshot
+from template_bank import CACHE_DIR
+
+# Where the pixel constants below were measured
+REFERENCE_SIZE = (3840, 2160)
+REFERENCE_RECT = (147, 63)
+REFERENCE_COLUMNS = [1764, 1969, 2174, 2379, 2584] # score, assists, score, points, saves
+REFERENCE_ROWS = [y - 40 for y in [839, 954, 1243, 1358]] # individual player, moved up a bit
+
+REFERENCE_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "board_reference.png")
+MIN_MATCH_SCORE = 0.5  # below this the board is considered not found
+
+# Absolute screen coordinates, in ScoreboardReader's argument order
+Placement = namedtuple("Placement", ["columns", "rows", "rect"])
+
+
+class BoardLayout:
+    """
+    board: (left, top, width, height) of the cells' bounding box, fractions of the monitor
+    columns / rows: cell starts, fractions of the board width / height
+    rect: (width, height) of one cell, fractions of the board
+    reference_size: monitor size the layout was measured at (for calibration)
+    """
+
+    def __init__(self, board, columns, rows, rect, reference_size=REFERENCE_SIZE):
+        self.board = tuple(board)
+        self.columns = list(columns)
+        self.rows = list(rows)
+        self.rect = tuple(rect)
+        self.reference_size = tuple(reference_size)
+
+    @classmethod
+    def from_pixels(cls, columns, rows, rect, monitor_size=REFERENCE_SIZE):
+        # Absolute cell coordinates measured on a monitor_size (width, height) screen
+        region = board_region(columns, rows, rect)
+        mw, mh = monitor_size
+        bw, bh = region["width"], region["height"]
+        return cls(
+            board=(region["left"] / mw, region["top"] / mh, bw / mw, bh / mh),
+            columns=[(x - region["left"]) / bw for x in columns],
+            rows=[(y - region["top"]) / bh for y in rows],
+            rect=(rect[0] / bw, rect[1] / bh),
+            reference_size=monitor_size,
+        )
+
+    def reference_board_size(self):
+        # Board size in pixels on the reference monitor
+        return (round(self.board[2] * self.reference_size[0]), round(self.board[3] * self.reference_size[1]))
+
+    def place_board(self, left, top, width, height):
+        # Board box in absolute pixels -> Placement of every cell
+        return Placement(
+            columns=[left + round(x * width) for x in self.columns],
+            rows=[top + round(y * height) for y in self.rows],
+            rect=(round(self.rect[0] * width), round(self.rect[1] * height)),
+        )
+
+    def place(self, monitor):
+        # monitor: mss monitor dict (left, top, width, height), board scaled with it
+        left, top, width, height = self.board
+        return self.place_board(monitor["left"] + round(left * monitor["width"]),
+                                monitor["top"] + round(top * monitor["height"]),
+                                round(width * monitor["width"]), round(height * monitor["height"]))
+
+    def place_scaled(self, monitor, x, y, scale):
+        # Board found at (x, y) relative to the monitor, `scale` times its reference size
+        bw, bh = self.reference_board_size()
+        return self.place_board(monitor["left"] + x, monitor["top"] + y, round(bw * scale), round(bh * scale))
+
+
+DEFAULT_LAYOUT = BoardLayout.from_pixels(REFERENCE_COLUMNS, REFERENCE_ROWS, REFERENCE_RECT)
+
+
+def _gray(img):
+    if img.ndim == 2:
+        return img
+    return cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY if img.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+
+
+def _match(screen, reference, scale, window=None):
+    """
+    Best TM_CCOEFF_NORMED match of the reference resized by `scale`.
+    window: optional (x0, y0, x1, y1) of screen to search in
+    returns: (x, y, score) in screen coordinates, or None if it doesn't fit
+    """
+    h, w = reference.shape
+    tw, th = round(w * scale), round(h * scale)
+    if tw < 8 or th < 8:
+        return None
+    x0, y0, x1, y1 = window or (0, 0, screen.shape[1], screen.shape[0])
+    x0, y0 = max(0, x0), max(0, y0)
+    x1, y1 = min(screen.shape[1], x1), min(screen.shape[0], y1)
+    if x1 - x0 < tw or y1 - y0 < th:
+        return None
+    template = cv2.resize(reference, (tw, th), interpolation=cv2.INTER_AREA)
+    result = cv2.matchTemplate(screen[y0:y1, x0:x1], template, cv2.TM_CCOEFF_NORMED)
+    _, score, _, (x, y) = cv2.minMaxLoc(result)
+    return x0 + x, y0 + y, score
+
+
+def locate_board(screen, reference, expected_scale=1.0, scale_range=0.25, steps=9, levels=3):
+    """
+    Coarse-to-fine search for the reference image in the screen: every scale
+    on the smallest pyramid level, then each finer level only refines the
+    best scale (+/- half the previous step) in a few pixels around the hit.
+    screen, reference: grayscale or BGR(A) images
+    returns: (x, y, scale, score) of the reference's top left corner in screen
+    """
+    screen, reference = _gray(screen), _gray(reference)
+    pyramid = [screen]
+    for _ in range(levels - 1):
+        pyramid.append(cv2.pyrDown(pyramid[-1]))
+
+    factor = 2 ** (levels - 1)
+    scales = np.linspace(expected_scale * (1 - scale_range), expected_scale * (1 + scale_range), steps)
+    best = None
+    for scale in scales:
+        hit = _match(pyramid[-1], reference, scale / factor)
+        if hit is not None and (best is None or hit[2] > best[3]):
+            best = (hit[0] * factor, hit[1] * factor, scale, hit[2])
+    if best is None:
+        return None
+
+    # Down the pyramid, then keep halving the scale step at full resolution
+    # until it changes the board size by less than a pixel
+    step = scales[1] - scales[0] if steps > 1 else 0.0
+    level_order = list(range(levels - 2, -1, -1))
+    while step / 2 * max(reference.shape) >= 1 or level_order:
+        level = level_order.pop(0) if level_order else 0
+        factor = 2 ** level
+        step /= 2
+        x, y, scale, _ = best
+        # Position is known to about 2 px of the coarser level, the scale to +/- step
+        margin = 4 + int(step * max(reference.shape) / factor)
+        refined = None
+        for s in (scale - step, scale, scale + step):
+            th, tw = round(reference.shape[0] * s / factor), round(reference.shape[1] * s / factor)
+            window = (x // factor - margin, y // factor - margin,
+                      x // factor + tw + margin, y // factor + th + margin)
+            hit = _match(pyramid[level], reference, s / factor, window)
+            if hit is not None and (refined is None or hit[2] > refined[3]):
+                refined = (hit[0] * factor, hit[1] * factor, s, hit[2])
+        best = refined or best
+    return best
+
+
+def _cache_path(cache_dir):
+    return os.path.join(cache_dir, "layout.json")
+
+
+def _load_cache(cache_dir):
+    try:
+        with open(_cache_path(cache_dir)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache_dir, cache):
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = _cache_path(cache_dir) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp, _cache_path(cache_dir))
+
+
+def save_reference(sct, monitor, layout=DEFAULT_LAYOUT, path=REFERENCE_IMAGE):
+    # Saves the board as currently placed on the monitor, for later calibrations
+    columns, rows, rect = layout.place(monitor)
+    frame = frame_from_screenshot(sct.grab(board_region(columns, rows, rect)))
+    board = cv2.resize(_gray(frame), layout.reference_board_size(), interpolation=cv2.INTER_AREA)
+    cv2.imwrite(path, board)
+    return path
+
+
+def calibrate(sct, monitor, layout=DEFAULT_LAYOUT, reference=REFERENCE_IMAGE, cache_dir=CACHE_DIR,
+              recalibrate=False):
+    """
+    sct: mss session, monitor: one of sct.monitors
+    reference: grayscale board image at the layout's reference size, or its path
+    returns: Placement of the board on this monitor; found once per resolution
+             and cached, falls back to the plain scaled layout if not found
+    """
+    key = f"{monitor['width']}x{monitor['height']}"
+    cache = _load_cache(cache_dir)
+    if key in cache and not recalibrate:
+        entry = cache[key]
+        return layout.place_scaled(monitor, entry["x"], entry["y"], entry["scale"])
+
+    if isinstance(reference, str):
+        if not os.path.exists(reference):
+            print(f"Warning: no board reference at {reference}, using the scaled layout.")
+            return layout.place(monitor)
+        reference = cv2.imread(reference, cv2.IMREAD_GRAYSCALE)
+
+    screen = frame_from_screenshot(sct.grab(monitor))
+    expected_scale = monitor["height"] / layout.reference_size[1]
+    found = locate_board(screen, reference, expected_scale)
+    if found is None or found[3] < MIN_MATCH_SCORE:
+        print(f"Warning: board not found on the {key} monitor, using the scaled layout.")
+        return layout.place(monitor)
+
+    x, y, scale, score = found
+    cache[key] = {"x": int(x), "y": int(y), "scale": float(scale), "score": float(score)}
+    _save_cache(cache_dir, cache)
+    return layout.place_scaled(monitor, x, y, scale)
+
+
+if __name__ == "__main__":
+    import mss
+    from m import list_monitors
+
+    for idx, monitor in enumerate(list_monitors()[1:], start=1):
+        print(f"Monitor {idx}: scaled layout {DEFAULT_LAYOUT.place(monitor)}")
+    with mss.mss() as sct:
+        print(f"Calibrated: {calibrate(sct, sct.monitors[1])}")
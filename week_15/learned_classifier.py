@@ -0,0 +1,293 @@
+"""
+Small learned glyph classifier, pure NumPy.
+
+Training data are the glyphs the reader actually sees: labelled cell captures
+({col}_{row}_{value}.png from mm.save_cell) plus synthetic cells rendered from
+the font, both binarized and segmented like live cells. A cell only adds
+glyphs when segmentation finds exactly one glyph per char of its label.
+Segments of noise-only cells are an extra reject class ("") so specks that
+pass the size filter drop out instead of becoming a digit.
+
+The model: the normalized 32x32 glyph, 2x2 average pooled to 256 inputs, one
+hidden ReLU layer and a softmax; scores are the softmax probability, so
+mm.CONFIDENCE_THRESHOLD still applies. Weights live in one .npz file.
+
+    python learned_classifier.py train ./imgs ./captures_cells   # -> .template_cache/digit_model.npz
+"""
+import argparse
+import os
+import re
+import time
+
+import cv2
+import numpy as np
+
+import mm
+from segmentation import segment
+from strip_decoder import render_line_glyphs
+from template_bank import CACHE_DIR, get_centered_char_image
+
+MODEL_PATH = os.path.join(CACHE_DIR, "digit_model.npz")  # generated, kept out of the source tree
+CHARS = "0123456789."
+REJECT = ""  # class for segments that are not a char
+CELL_SIZE = (147, 63)
+CELL_NAME = re.compile(r"^(\d+)_(\d+)_([\d.]*)$")  # {col}_{row}_{value}
+
+
+def features(glyphs):
+    # glyphs: list / stack of 32x32 normalized glyphs -> (n, 256) float32 in 0..1
+    stacked = np.asarray(glyphs) if isinstance(glyphs, np.ndarray) else np.stack(glyphs)
+    n = len(stacked)
+    # INTER_AREA halving is an exact 2x2 average; all glyphs stacked into one tall image, one call
+    tall = stacked.reshape(n * 32, 32).astype(np.float32)
+    pooled = cv2.resize(tall, (16, n * 16), interpolation=cv2.INTER_AREA)
+    return pooled.reshape(n, 256) * (1.0 / 255)
+
+
+class LearnedClassifier:
+    # Same interface as glyph_classifier.CorrelationClassifier
+
+    def __init__(self, weights, chars):
+        # weights: dict with w1 (256, hidden), b1, w2 (hidden, n_classes), b2
+        self.weights = {k: np.array(v, dtype=np.float32) for k, v in weights.items()}
+        for w in self.weights.values():
+            # Weight decay leaves denormals behind, they make the matmul ~30x slower
+            w[np.abs(w) < np.finfo(np.float32).tiny] = 0
+        self.chars = list(chars)
+
+    def __len__(self):
+        return len(self.chars)
+
+    def logits(self, glyphs):
+        hidden = features(glyphs) @ self.weights["w1"]
+        hidden += self.weights["b1"]
+        np.maximum(hidden, 0, out=hidden)
+        logits = hidden @ self.weights["w2"]
+        logits += self.weights["b2"]
+        return logits
+
+    def probabilities(self, glyphs):
+        if len(glyphs) == 0:
+            return np.zeros((0, len(self.chars)), dtype=np.float32)
+        logits = self.logits(glyphs)
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def classify(self, glyphs):
+        # returns: list of (best_char, probability), REJECT ("") for non-glyphs
+        if len(glyphs) == 0:
+            return []
+        logits = self.logits(glyphs)
+        best = logits.max(axis=1, keepdims=True)
+        probs = 1 / np.exp(logits - best).sum(axis=1)  # softmax of the best class only
+        return [(self.chars[i], p) for i, p in zip(logits.argmax(axis=1).tolist(), probs.tolist())]
+
+    def save(self, path=MODEL_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez(path, chars=np.array(self.chars), **self.weights)
+        return path
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        with np.load(path) as data:
+            return cls({k: data[k] for k in ("w1", "b1", "w2", "b2")}, data["chars"].tolist())
+
+
+def glyph_samples(mask, text):
+    # Segments a binarized cell, returns [(32x32 glyph, char)] if the glyphs line up with text
+    rois = segment(mask)
+    if len(rois) != len(text):
+        return []
+    return [(get_centered_char_image(roi), char) for (x, y, w, h, roi), char in zip(rois, text)]
+
+
+def capture_samples(directories):
+    """
+    directories: folders with {col}_{row}_{value}.png cell captures, binarized
+                 with their row's color like the reader does
+    returns: list of (glyph, char) and the number of cells used / seen
+    """
+    samples, used, seen = [], 0, 0
+    for directory in directories:
+        for name in sorted(os.listdir(directory)):
+            match = CELL_NAME.match(os.path.splitext(name)[0])
+            if not match or not match.group(3):
+                continue
+            img = cv2.imread(os.path.join(directory, name), cv2.IMREAD_UNCHANGED)
+            if img is None:
+                continue
+            if img.ndim == 2:
+                img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGRA)
+            mask = mm.binarize_cell(img, mm.row_color(int(match.group(2))))
+            cell_samples = glyph_samples(mask, match.group(3))
+            seen += 1
+            used += bool(cell_samples)
+            samples += cell_samples
+    return samples, used, seen
+
+
+def _random_text(rng):
+    text = str(rng.integers(0, 10 ** rng.integers(1, 5)))
+    if len(text) > 1 and rng.random() < 0.2:
+        cut = rng.integers(1, len(text))
+        text = text[:cut] + "." + text[cut:]
+    return text
+
+
+def _degrade(alpha, rng):
+    # Blur, noise and a random threshold, like a color mask with tolerance on a noisy capture
+    sigma = rng.uniform(0, 1.4)
+    if sigma > 0.3:
+        alpha = cv2.GaussianBlur(alpha, (0, 0), sigma)
+    alpha = alpha + rng.normal(0, rng.uniform(0, 0.08), alpha.shape).astype(np.float32)
+    mask = ((alpha > rng.uniform(0.25, 0.75)) * 255).astype(np.uint8)
+    if rng.random() < 0.15:
+        op = cv2.erode if rng.random() < 0.5 else cv2.dilate
+        mask = op(mask, np.ones((2, 2), np.uint8))
+    return mask
+
+
+def synthetic_samples(count, rng, font_path, font_sizes=range(22, 58, 4)):
+    """
+    Renders `count` synthetic cells from the font's glyphs (shared baseline so
+    the decimal point sits where it does on screen), binarizes and segments them.
+    returns: list of (glyph, char)
+    """
+    glyph_sets = {size: render_line_glyphs(font_path, CHARS, size) for size in font_sizes}
+    cell_w, cell_h = CELL_SIZE
+    samples = []
+    for _ in range(count):
+        text = _random_text(rng)
+        glyphs = glyph_sets[rng.choice(list(glyph_sets))]
+        spacing = int(rng.integers(-1, 7))
+        height = glyphs["0"].shape[0]
+        width = sum(glyphs[c].shape[1] for c in text) + spacing * (len(text) - 1)
+        if width + 4 > cell_w or height + 4 > cell_h:
+            continue
+        alpha = np.zeros((cell_h, cell_w), dtype=np.float32)
+        x = int(rng.integers(2, cell_w - width - 1))
+        y = int(rng.integers(2, cell_h - height - 1))
+        for char in text:
+            glyph = glyphs[char].astype(np.float32) / 255
+            region = alpha[y:y + height, x:x + glyph.shape[1]]
+            np.maximum(region, glyph, out=region)
+            x += glyph.shape[1] + spacing
+        samples += glyph_samples(_degrade(alpha, rng), text)
+    return samples
+
+
+def reject_samples(count, rng):
+    # Segments of cells that hold only noise, streaks and specks
+    cell_w, cell_h = CELL_SIZE
+    samples = []
+    while len(samples) < count:
+        alpha = (rng.random((cell_h, cell_w)) < rng.uniform(0.002, 0.02)).astype(np.float32)
+        for _ in range(rng.integers(0, 3)):
+            x, y = rng.integers(0, cell_w - 4), rng.integers(0, cell_h - 20)
+            alpha[y:y + rng.integers(11, 20), x:x + rng.integers(2, 5)] = rng.uniform(0.5, 1)
+        alpha = cv2.dilate(alpha, np.ones((2, 2), np.uint8)) if rng.random() < 0.5 else alpha
+        mask = _degrade(alpha, rng)
+        samples += [(get_centered_char_image(roi), REJECT) for x, y, w, h, roi in segment(mask)]
+    return samples[:count]
+
+
+def train(samples, chars=(REJECT,) + tuple(CHARS), hidden=64, epochs=30, batch_size=128,
+          learning_rate=0.01, weight_decay=1e-4, seed=0):
+    """
+    Fits the one hidden layer softmax net with Adam on (glyph, char) samples.
+    returns: LearnedClassifier
+    """
+    rng = np.random.default_rng(seed)
+    index = {c: i for i, c in enumerate(chars)}
+    x = features([glyph for glyph, _ in samples])
+    y = np.array([index[c] for _, c in samples])
+    n, d = x.shape
+    k = len(chars)
+
+    params = {
+        "w1": rng.normal(0, np.sqrt(2 / d), (d, hidden)).astype(np.float32),
+        "b1": np.zeros(hidden, dtype=np.float32),
+        "w2": rng.normal(0, np.sqrt(2 / hidden), (hidden, k)).astype(np.float32),
+        "b2": np.zeros(k, dtype=np.float32),
+    }
+    moments = {name: (np.zeros_like(p), np.zeros_like(p)) for name, p in params.items()}
+    beta1, beta2, step = 0.9, 0.999, 0
+
+    for epoch in range(epochs):
+        order = rng.permutation(n)
+        lr = learning_rate * 0.5 * (1 + np.cos(np.pi * epoch / epochs))  # cosine decay
+        for start in range(0, n, batch_size):
+            batch = order[start:start + batch_size]
+            xb, yb = x[batch], y[batch]
+            pre = xb @ params["w1"] + params["b1"]
+            hid = np.maximum(pre, 0)
+            logits = hid @ params["w2"] + params["b2"]
+            logits -= logits.max(axis=1, keepdims=True)
+            probs = np.exp(logits)
+            probs /= probs.sum(axis=1, keepdims=True)
+
+            # Cross entropy gradient, back through both layers
+            dlogits = probs
+            dlogits[np.arange(len(yb)), yb] -= 1
+            dlogits /= len(yb)
+            dhid = dlogits @ params["w2"].T
+            dhid[pre <= 0] = 0
+            grads = {
+                "w1": xb.T @ dhid + weight_decay * params["w1"],
+                "b1": dhid.sum(axis=0),
+                "w2": hid.T @ dlogits + weight_decay * params["w2"],
+                "b2": dlogits.sum(axis=0),
+            }
+
+            step += 1
+            for name, grad in grads.items():
+                m, v = moments[name]
+                m *= beta1
+                m += (1 - beta1) * grad
+                v *= beta2
+                v += (1 - beta2) * grad * grad
+                m_hat = m / (1 - beta1 ** step)
+                v_hat = v / (1 - beta2 ** step)
+                params[name] -= (lr * m_hat / (np.sqrt(v_hat) + 1e-8)).astype(np.float32)
+    return LearnedClassifier(params, chars)
+
+
+def accuracy(classifier, samples):
+    if not samples:
+        return 0.0
+    predicted = classifier.classify([glyph for glyph, _ in samples])
+    return float(np.mean([p[0] == c for p, (_, c) in zip(predicted, samples)]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the learned glyph classifier")
+    parser.add_argument("command", choices=["train"])
+    parser.add_argument("captures", nargs="*", help="folders with {col}_{row}_{value}.png cells")
+    parser.add_argument("--font", default="Bourgeois-Book.otf")
+    parser.add_argument("--synthetic", type=int, default=8000, help="synthetic cells to render")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--hidden", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=MODEL_PATH)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    start = time.perf_counter()
+    samples, used, seen = capture_samples(args.captures)
+    print(f"{len(samples)} glyphs from {used}/{seen} captured cells")
+    synthetic = synthetic_samples(args.synthetic, rng, args.font)
+    rejects = reject_samples(len(synthetic) // 10, rng)
+    print(f"{len(synthetic)} synthetic glyphs, {len(rejects)} reject samples "
+          f"({time.perf_counter() - start:.1f} s)")
+
+    samples += synthetic + rejects
+    order = rng.permutation(len(samples))
+    split = len(samples) // 10
+    held_out = [samples[i] for i in order[:split]]
+    training = [samples[i] for i in order[split:]]
+
+    start = time.perf_counter()
+    model = train(training, hidden=args.hidden, epochs=args.epochs, seed=args.seed)
+    print(f"trained in {time.perf_counter() - start:.1f} s: train accuracy {accuracy(model, training):.1%}, "
+          f"held out {accuracy(model, held_out):.1%}")
+    print(f"Wrote {model.save(args.out)}")
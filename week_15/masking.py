@@ -0,0 +1,116 @@
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+
+def color_bounds(expected_rgb, tolerance=40):
+    """
+    expected_rgb: tuple (r, g, b) of the text color
+    returns: (lower, upper) BGRA bounds for cv2.inRange on the raw capture,
+             alpha accepts anything so the alpha channel never has to be sliced off
+    """
+    r, g, b = expected_rgb
+    target = np.array([b, g, r], dtype=np.int16)
+    lower = np.append(np.clip(target - tolerance, 0, 255), 0).astype(np.uint8)
+    upper = np.append(np.clip(target + tolerance, 0, 255), 255).astype(np.uint8)
+    return lower, upper
+
+
+def _lut_dtype(colors):
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if colors <= np.iinfo(dtype).bits:
+            return dtype
+    raise ValueError("At most 32 colors fit in a uint32 bit set")
+
+
+@lru_cache(maxsize=4)
+def _palette_lut(palette, tolerance):
+    lut = np.zeros(1 << 24, dtype=_lut_dtype(len(palette)))
+    cube = lut.reshape(256, 256, 256)  # [r, g, b]
+    for i, rgb in enumerate(palette):
+        lower, upper = color_bounds(rgb, tolerance)
+        b0, g0, r0 = lower[:3].astype(int)
+        b1, g1, r1 = upper[:3].astype(int)
+        cube[r0:r1 + 1, g0:g1 + 1, b0:b1 + 1] |= 1 << i
+    lut.flags.writeable = False  # shared by every masker with this palette
+    return lut
+
+
+def build_palette_lut(palette, tolerance=40):
+    """
+    palette: list of (r, g, b) text colors, bit i belongs to palette[i]
+    returns: 2^24 entry table indexed by (r << 16) | (g << 8) | b, holding the set
+             of color boxes the pixel falls in as bits (uint8 up to 8 colors,
+             uint16 / uint32 above), so overlapping boxes keep every color.
+             Built once per (palette, tolerance) and shared, read only.
+    """
+    return _palette_lut(tuple(tuple(int(v) for v in rgb) for rgb in palette), tolerance)
+
+
+class PaletteMasker:
+    """
+    Masks every cell of a board frame in one pass over the rows that hold cells.
+
+    Each BGRA pixel is read as one little endian uint32 (B | G << 8 | R << 16),
+    looked up in a palette table to get the set of colors it matches (one bit
+    each) and ANDed with a precomputed map of the bit each cell expects. Same
+    result as cv2.inRange with +/- tolerance per cell, also where the color
+    boxes overlap, but one lookup no matter how many colors.
+
+    cell_colors[row_idx][col_idx]: (r, g, b) or None for cells that need Otsu
+    instead (apply() returns None for those).
+    """
+
+    def __init__(self, region, columns, rows, rect, cell_colors, tolerance=40):
+        palette = sorted({c for row in cell_colors for c in row if c is not None})
+        bits = {rgb: 1 << i for i, rgb in enumerate(palette)}
+        self.lut = build_palette_lut(palette, tolerance)
+
+        shape = (region["height"], region["width"])
+        self.expected = np.zeros(shape, dtype=self.lut.dtype)
+        self.mask = np.zeros(shape, dtype=np.uint8)
+        self._keys = np.zeros(shape, dtype=np.uint32)
+        self._labels = np.zeros(shape, dtype=self.lut.dtype)
+
+        self.cells = []
+        spans = []
+        for i, row_start in enumerate(rows):
+            y = row_start - region["top"]
+            row_cells = []
+            for j, col_start in enumerate(columns):
+                x = col_start - region["left"]
+                rgb = cell_colors[i][j]
+                if rgb is None:
+                    row_cells.append(None)
+                    continue
+                self.expected[y:y + rect[1], x:x + rect[0]] = bits[rgb]
+                row_cells.append(self.mask[y:y + rect[1], x:x + rect[0]])
+            self.cells.append(row_cells)
+            spans.append((y, y + rect[1]))
+
+        # Merge overlapping row spans, the gaps between rows are never touched
+        self.bands = []
+        for start, end in sorted(spans):
+            if self.bands and start <= self.bands[-1][1]:
+                self.bands[-1] = (self.bands[-1][0], max(end, self.bands[-1][1]))
+            else:
+                self.bands.append((start, end))
+
+    def apply(self, frame):
+        """
+        frame: (h, w, 4) BGRA capture of the region given to __init__
+        returns: masks[row_idx][col_idx], views into one shared mask buffer
+                 that the next apply() overwrites
+        """
+        pixels = frame.view("<u4")[:, :, 0]
+        for y0, y1 in self.bands:
+            keys = self._keys[y0:y1]
+            np.bitwise_and(pixels[y0:y1], 0xFFFFFF, out=keys)
+            labels = self._labels[y0:y1]
+            np.take(self.lut, keys, out=labels)
+            np.bitwise_and(labels, self.expected[y0:y1], out=labels)
+            if labels.dtype == np.uint32:
+                labels = labels.view(np.int32)  # cv2 has no uint32, only != 0 matters
+            cv2.compare(labels, 0, cv2.CMP_NE, dst=self.mask[y0:y1])
+        return self.cells
@@ -2,67 +2,191 @@ import mss
 import cv2
 import numpy as np
 import pytesseract
+import os
 import time
-from PIL import Image, ImageDraw, ImageFont
+from glyph_classifier import CLASSIFIERS
+from capture import board_region, grab_frame, cell_views
+from change_detect import CellChangeDetector
+from glyph_cache import GlyphCache
+from archive import CaptureArchive
+from template_bank import get_centered_char_image, load_templates
+from tesseract_batch import read_masks_with_tesseract
+from masking import color_bounds, PaletteMasker
+from layout import REFERENCE_COLUMNS, REFERENCE_ROWS, REFERENCE_RECT
+from segmentation import DEFAULT_ENGINE as DEFAULT_SEGMENTATION, segment, segment_all
+from timing import FixedRate
 
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
 # OCR Configuration
 FONT_PATH = "Bourgeois-Book.otf"
 REFERENCE_TEMPLATES = {}
-
-def get_centered_char_image(image_array, target_size=(32, 32)):
-    # image_array: binary numpy array (white text on black)
-    # returns: 32x32 numpy array with centered character
-    
-    h, w = image_array.shape
-    scale = min(target_size[0] / h, target_size[1] / w)
-    new_h, new_w = int(h * scale), int(w * scale)
-    
-    resized = cv2.resize(image_array, (new_w, new_h), interpolation=cv2.INTER_AREA)
-    
-    canvas = np.zeros(target_size, dtype=np.uint8)
-    y_off = (target_size[0] - new_h) // 2
-    x_off = (target_size[1] - new_w) // 2
-    
-    canvas[y_off:y_off+new_h, x_off:x_off+new_w] = resized
-    return canvas
+CLASSIFIER = None
+CONFIDENCE_THRESHOLD = 0.6
+CLASSIFIER_ENGINE = "correlation"  # or "hamming" (bit-packed, see glyph_classifier.CLASSIFIERS), "learned"
 
 def init_templates():
-    global REFERENCE_TEMPLATES
+    global REFERENCE_TEMPLATES, CLASSIFIER
     if REFERENCE_TEMPLATES:
         return
 
     try:
         # Load font - size 64 for good resolution template generation
-        font = ImageFont.truetype(FONT_PATH, 64)
+        # (compiled once into .template_cache, later starts just map the file)
+        REFERENCE_TEMPLATES = load_templates(FONT_PATH, "0123456789.", font_size=64)
     except IOError:
         print(f"Warning: Could not load {FONT_PATH}, falling back to default/Tesseract.")
         return
 
-    chars = "0123456789."
-    for char in chars:
-        # Draw char on PIL image
-        img = Image.new('L', (100, 100), 0)
-        draw = ImageDraw.Draw(img)
-        draw.text((20, 20), char, font=font, fill=255)
+    if CLASSIFIER_ENGINE == "learned":
+        # Trained by learned_classifier.py, imported here since it imports this module
+        from learned_classifier import MODEL_PATH, LearnedClassifier
+        if os.path.exists(MODEL_PATH):
+            CLASSIFIER = LearnedClassifier.load(MODEL_PATH)
+            return
+        print(f"Warning: no model at {MODEL_PATH}, using the correlation classifier.")
+        CLASSIFIER = CLASSIFIERS["correlation"](REFERENCE_TEMPLATES)
+        return
+
+    # Whole bank as one normalized matrix (or bit array), glyphs get scored in one go
+    CLASSIFIER = CLASSIFIERS[CLASSIFIER_ENGINE](REFERENCE_TEMPLATES)
+
+
+# Board at the reference resolution, see layout.py (calibrate() places it on other monitors)
+specs_rect = REFERENCE_RECT
+specs_columns = REFERENCE_COLUMNS
+specs_rows = REFERENCE_ROWS
+# Column names for print_board and the stream events
+HEADERS = ["Score", "Goals", "Assists", "Saves", "Shots"]
+
+# Text color per row (None = Otsu threshold instead of a color mask)
+# First two rows: rgb(247,253,255), Last two rows: rgb(255, 244, 174)
+ROW_COLORS = [(247, 253, 255), (247, 253, 255), (255, 244, 174), (255, 244, 174)]
+COLOR_TOLERANCE = 40
+
+
+def binarize_cell(img, expected_rgb=None, out=None):
+    """
+    img: BGRA cell image (may be a view into a bigger frame)
+    expected_rgb: tuple (r, g, b) of the text color
+    out: optional preallocated uint8 mask to write into
+    returns: mask with white text on black
+    """
+    if expected_rgb:
+        # Color filtering approach, bounds are BGRA so the capture is used as is
+        lower, upper = color_bounds(expected_rgb, COLOR_TOLERANCE)
+        if img.shape[2] == 3:
+            lower, upper = lower[:3], upper[:3]
         
-        # Crop to bounding box
-        bbox = img.getbbox()
-        if bbox:
-            cropped = img.crop(bbox)
-            # Convert to numpy
-            char_np = np.array(cropped)
-            # Normalize to fixed size
-            REFERENCE_TEMPLATES[char] = get_centered_char_image(char_np)
+        # Create mask (matches will be white, others black)
+        thresh = cv2.inRange(img, lower, upper, dst=out)
+    else:
+        gray = cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY)
+        
+        # Thresholding (Otsu)
+        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=out)
+        
+        # Check if we need to invert (we want white text on black bg)
+        # If mean is high (>127), background is white, so invert
+        if cv2.mean(thresh)[0] > 127:
+            thresh = cv2.bitwise_not(thresh, dst=thresh)
+    return thresh
+
+def find_char_rois(thresh, engine=DEFAULT_SEGMENTATION):
+    # returns: list of (x, y, w, h, roi) per character, left to right
+    return segment(thresh, engine)
 
+def _classify_glyphs(rois, classifier, cache=None, timing=None):
+    # Normalize the ROIs and score them against every template at once, cached ones are skipped
+    lookup = []  # time from the lap before the cache call to its miss callback
 
-specs_rect = (147, 63)
-specs_columns = [1764, 1969, 2174, 2379, 2584] # score, assists, score, points, saves
-specs_rows = [839, 954, 1243, 1358] # individual player
-# move up a bit
-specs_rows = [y - 40 for y in specs_rows]
+    def classify(rois):
+        if timing and cache is not None:
+            lookup.append(timing.split())
+        targets = [get_centered_char_image(roi) for roi in rois]
+        if timing:
+            timing.lap("normalize")
+        results = classifier.classify(targets)
+        if timing:
+            timing.lap("match")
+        return results
+    if cache is not None:
+        results = cache.classify(rois, classify)
+        if timing:
+            # Lookups before and stores after the misses, one sample per call
+            timing.add("glyph_cache", sum(lookup) + timing.split())
+        return results
+    return classify(rois)
 
+def classify_rois(char_rois, classifier, cache=None):
+    detected_text = ""
+    for best_char, best_score in _classify_glyphs([roi for x, y, w, h, roi in char_rois], classifier, cache):
+        if best_score > CONFIDENCE_THRESHOLD:
+            detected_text += best_char
+    return detected_text
+
+def recognize_masks(masks, classifier, cache=None, timing=None):
+    """
+    Segments all masks together and classifies every glyph of the batch in
+    one classifier call.
+    cache: optional GlyphCache, glyphs seen before are looked up instead
+    timing: optional PipelineTimer, gets segment / glyph_cache / normalize / match laps
+    returns: detected string per mask
+    """
+    rois_per_mask = segment_all(masks)
+    if timing:
+        timing.lap("segment")
+    rois = [roi for rois in rois_per_mask for x, y, w, h, roi in rois]
+    results = iter(_classify_glyphs(rois, classifier, cache, timing))
+
+    values = []
+    for rois in rois_per_mask:
+        detected_text = ""
+        for best_char, best_score in (next(results) for _ in rois):
+            if best_score > CONFIDENCE_THRESHOLD:
+                detected_text += best_char
+        values.append(detected_text)
+    return values
+
+def read_with_tesseract(thresh):
+    custom_config = r'--psm 6 -c tessedit_char_whitelist=0123456789.'
+    try:
+        text = pytesseract.image_to_string(thresh, config=custom_config)
+        return ''.join(filter(lambda x: x.isdigit() or x == '.', text))
+    except pytesseract.TesseractNotFoundError:
+        print("Error: Tesseract is not installed or not in PATH.")
+        return ""
+
+def recognize_mask(thresh, classifier=None):
+    """
+    thresh: binary mask with white text on black
+    classifier: CorrelationClassifier to use, defaults to the module one
+    returns: detected string of digits and dots
+    """
+    if classifier is None:
+        # Initialize templates once
+        init_templates()
+        classifier = CLASSIFIER
+
+    # Template Matching Approach using Custom Font
+    if classifier is not None and len(classifier):
+        return classify_rois(find_char_rois(thresh), classifier)
+
+    # Fallback to Tesseract if initialization failed
+    return read_with_tesseract(thresh)
+
+def read_cell(img, expected_rgb=None, classifier=None, out=None):
+    """
+    img: BGRA cell image (may be a view into a bigger frame)
+    expected_rgb: tuple (r, g, b) of the text color
+    returns: detected string of digits and dots
+    """
+    return recognize_mask(binarize_cell(img, expected_rgb, out), classifier)
+
+def save_cell(img, detected_value, col_idx=0, row_idx=0):
+    # Save the captured image with the result
+    filename = f"{col_idx}_{row_idx}_{detected_value}.png"
+    cv2.imwrite(filename, img)
 
 def look_for_number(x_range, y_range, expected_rgb=None, col_idx=0, row_idx=0):
     """
@@ -72,11 +196,6 @@ def look_for_number(x_range, y_range, expected_rgb=None, col_idx=0, row_idx=0):
     col_idx: column index for saving file
     row_idx: row index for saving file
     """
-    # Initialize templates once
-    init_templates()
-
-    detected_value = ""
-
     with mss.mss() as sct:
 
         # Calculate the bounding box for the region relative to the monitor
@@ -85,90 +204,270 @@ def look_for_number(x_range, y_range, expected_rgb=None, col_idx=0, row_idx=0):
         region = {"top": y1, "left": x1, "width": x2 - x1, "height": y2 - y1}
         
         # Capture the screen
-        sct_img = sct.grab(region)
-        img = np.array(sct_img)
-        
-        if expected_rgb:
-            # Color filtering approach
-            r, g, b = expected_rgb
-            # Convert RGB to BGR for OpenCV
-            target_bgr = np.array([b, g, r], dtype=np.uint8)
-            
-            # Use BGR image (drop alpha)
-            img_bgr = img[:, :, :3]
-            
-            # Define color range with tolerance
-            tolerance = 40
-            lower = np.clip(target_bgr - tolerance, 0, 255)
-            upper = np.clip(target_bgr + tolerance, 0, 255)
-            
-            # Create mask (matches will be white, others black)
-            thresh = cv2.inRange(img_bgr, lower, upper)
-        else:
-            gray = cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY)
-            
-            # Thresholding (Otsu)
-            _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            
-            # Check if we need to invert (we want white text on black bg)
-            # If mean is high (>127), background is white, so invert
-            if cv2.mean(thresh)[0] > 127:
-                thresh = cv2.bitwise_not(thresh)
-
-        # Template Matching Approach using Custom Font
-        if REFERENCE_TEMPLATES:
-            contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            # Filter contours by size/area to remove noise
-            char_rois = []
-            for c in contours:
-                x, y, w, h = cv2.boundingRect(c)
-                if h > 10 and w > 2: # Minimal size filter
-                    char_rois.append((x, y, w, h, thresh[y:y+h, x:x+w]))
-            
-            # Sort by x coordinate (left to right)
-            char_rois.sort(key=lambda r: r[0])
-            
-            detected_text = ""
-            for x, y, w, h, roi in char_rois:
-                # Normalize ROI
-                target = get_centered_char_image(roi)
-                
-                best_score = -1
-                best_char = ""
-                
-                for char, template in REFERENCE_TEMPLATES.items():
-                    # Simple Correlation or Normalized Cross-Correlation
-                    res = cv2.matchTemplate(target, template, cv2.TM_CCORR_NORMED)
-                    score = res[0][0]
-                    if score > best_score:
-                        best_score = score
-                        best_char = char
-                
-                if best_score > 0.6: # Confidence threshold
-                    detected_text += best_char
-            
-            detected_value = detected_text
+        img = grab_frame(sct, region)
+        detected_value = read_cell(img, expected_rgb)
+        save_cell(img, detected_value, col_idx, row_idx)
+    
+    return detected_value
 
+def row_color(row_idx):
+    # Text color of a row, rows past the end of ROW_COLORS use its last entry
+    return ROW_COLORS[min(row_idx, len(ROW_COLORS) - 1)]
+
+class ScoreboardReader:
+    """
+    Keeps everything a read needs alive between cycles: one mss session,
+    the template bank and a preallocated mask per cell.
+
+    run() reads at target_hz on a fixed schedule (deadlines are computed from
+    the start time, not from when the last read finished) and drops to idle_hz
+    once no cell has changed for idle_after seconds. Grab, recognition and the
+    callback run in lockstep; pipeline.Pipeline runs them on separate threads.
+
+    With skip_unchanged, cells whose mask is the same as last cycle (see
+    CellChangeDetector) reuse their last value instead of being recognized again.
+
+    archive: optional CaptureArchive that gets every freshly recognized cell,
+    written in the background instead of save_cells' cv2.imwrite per cell.
+
+    classifier: defaults to the module's 64px bank, pass e.g. a CorrelationClassifier
+    over load_multi_templates() when the game UI scale is not fixed.
+
+    decoder: e.g. StripDecoder.from_font(FONT_PATH), reads changed cells
+    without segmenting them first; used instead of classifier and workers.
+
+    timing: optional PipelineTimer, records per-stage and per-cycle durations
+    (see timing.py); None keeps the hot path free of any timing calls.
+
+    glyph_cache_size: entries of the GlyphCache that maps glyph bitmaps seen
+    before (in any cell or frame) straight to their char, 0 disables it.
+
+    workers: recognize changed cells in a pool of that many processes
+    (see ParallelRecognizer), worth it for dense boards only.
+
+    cell_colors[row_idx][col_idx]: text color per cell (None = Otsu), defaults
+    to ROW_COLORS per row. Color cells are masked together by a PaletteMasker.
+    """
+
+    def __init__(self, columns=None, rows=None, rect=None, target_hz=10.0, idle_hz=1.0,
+                 idle_after=5.0, save_cells=False, skip_unchanged=True, change_tolerance=0.0,
+                 archive=None, classifier=None, workers=None, cell_colors=None, sct=None,
+                 decoder=None, glyph_cache_size=4096, timing=None):
+        self.columns = list(columns or specs_columns)
+        self.rows = list(rows or specs_rows)
+        self.rect = tuple(rect or specs_rect)
+        self.target_hz = target_hz
+        self.idle_hz = idle_hz
+        self.idle_after = idle_after
+        self.save_cells = save_cells
+        self.archive = archive
+        self.changes = CellChangeDetector(change_tolerance) if skip_unchanged else None
+
+        if classifier is None:
+            init_templates()
+            classifier = CLASSIFIER
+        self.classifier = classifier
+        self.decoder = decoder
+        self.glyph_cache = GlyphCache(glyph_cache_size) if glyph_cache_size else None
+        self.timing = timing
+        self.pool = None
+        if workers and decoder is None:
+            from parallel import ParallelRecognizer
+            self.pool = ParallelRecognizer(workers, classifier)
+        if cell_colors is None:
+            cell_colors = [[row_color(i)] * len(self.columns) for i in range(len(self.rows))]
+        self.cell_colors = cell_colors
+
+        self.region = board_region(self.columns, self.rows, self.rect)
+        self.masker = PaletteMasker(self.region, self.columns, self.rows, self.rect, cell_colors,
+                                    COLOR_TOLERANCE)
+        self.masks = [[np.zeros((self.rect[1], self.rect[0]), dtype=np.uint8) for _ in self.columns]
+                      for _ in self.rows]
+
+        self.sct = sct
+        self._owns_sct = False
+        self.values = None
+        self.read_time = None  # wall clock time of the last grab
+        self.cycles = 0
+        self.missed_deadlines = 0
+        self.last_change = time.monotonic()
+
+    def open(self):
+        if self.sct is None:
+            self.sct = mss.mss()
+            self._owns_sct = True
+        return self
+
+    def close_session(self):
+        # Drops the mss session (closed if open() made it), the next read() opens a new one
+        if self._owns_sct and self.sct is not None:
+            self.sct.close()
+        self.sct = None
+        self._owns_sct = False
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+        self.close_session()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def is_idle(self):
+        return time.monotonic() - self.last_change > self.idle_after
+
+    def period(self):
+        return 1.0 / (self.idle_hz if self.is_idle() else self.target_hz)
+
+    def read(self):
+        """
+        Grabs the bounding rectangle of all cells once and reads every cell
+        from views into that one frame, so all values are from the same instant.
+        returns: values[row_idx][col_idx]
+        """
+        self.open()
+        self.read_time = time.time()
+        timing = self.timing
+        if timing:
+            timing.start()
+        frame = grab_frame(self.sct, self.region)
+        if timing:
+            timing.lap("grab")
+        return self._read_frame(frame)
+
+    def read_frame(self, frame):
+        """
+        frame: (h, w, 4) BGRA image of self.region, a live grab or a recorded one
+        returns: values[row_idx][col_idx]
+        """
+        if self.timing:
+            self.timing.start()
+        return self._read_frame(frame)
+
+    def _read_frame(self, frame):
+        timing = self.timing
+        cells = cell_views(frame, self.region, self.columns, self.rows, self.rect)
+
+        # Mask everything, then recognize only the cells that changed, in one batch
+        masks = self.masker.apply(frame)
+        masks = [[mask if mask is not None else binarize_cell(cell, None, out=self.masks[i][j])
+                  for j, (cell, mask) in enumerate(zip(row_cells, row_masks))]
+                 for i, (row_cells, row_masks) in enumerate(zip(cells, masks))]
+        if timing:
+            timing.lap("mask")
+
+        values = [["" for _ in self.columns] for _ in self.rows]
+        pending = []
+        for i, row_cells in enumerate(cells):
+            for j, cell in enumerate(row_cells):
+                mask = masks[i][j]
+                num = self.changes.check((i, j), mask) if self.changes is not None else None
+                if num is None:
+                    pending.append((i, j, cell, mask))
+                else:
+                    values[i][j] = num
+        if timing:
+            timing.lap("change_check")
+            recognize_start = time.perf_counter()
+
+        nums = self.recognize([mask for _, _, _, mask in pending])
+        if timing and pending:
+            timing.add("cell", (time.perf_counter() - recognize_start) / len(pending))
+
+        for (i, j, cell, mask), num in zip(pending, nums):
+            if self.changes is not None:
+                self.changes.store((i, j), num)
+            values[i][j] = num
+        if timing:
+            timing.lap("store")
+        if self.archive is not None:
+            for i, j, cell, mask in pending:
+                self.archive.submit(cell, values[i][j], col_idx=j, row_idx=i)
+            if timing:
+                timing.lap("archive")
+        if self.save_cells:
+            for i, j, cell, mask in pending:
+                save_cell(cell, values[i][j], col_idx=j, row_idx=i)
+            if timing:
+                timing.lap("save")
+
+        if values != self.values:
+            self.last_change = time.monotonic()
+        self.values = values
+        self.cycles += 1
+        if timing:
+            timing.end_cycle()
+        return values
+
+    def recognize(self, masks):
+        # One segmentation + classifier call for all masks; the Tesseract fallback is one call too
+        timing = self.timing
+        if self.decoder is not None:
+            nums = self.decoder.decode_all(masks)
+            stage = "decode"
+        elif self.pool is not None:
+            nums = self.pool.recognize(masks)
+            stage = "pool"
+        elif self.classifier is not None and len(self.classifier):
+            return recognize_masks(masks, self.classifier, self.glyph_cache, timing)
         else:
-            # Fallback to Tesseract if initialization failed
-            custom_config = r'--psm 6 -c tessedit_char_whitelist=0123456789.'
-            try:
-                text = pytesseract.image_to_string(thresh, config=custom_config)
-                digits = ''.join(filter(lambda x: x.isdigit() or x == '.', text))
-                detected_value = digits
-            except pytesseract.TesseractNotFoundError:
-                print("Error: Tesseract is not installed or not in PATH.")
-                detected_value = ""
+            nums = read_masks_with_tesseract(masks)
+            stage = "tesseract"
+        if timing:
+            timing.lap(stage)
+        return nums
 
-    # Save the captured image with the result
-    filename = f"{col_idx}_{row_idx}_{detected_value}.png"
-    cv2.imwrite(filename, img)
-    
-    return detected_value
+    def iter_values(self, max_cycles=None):
+        """
+        Generator version of run(): yields the values of every cycle on the
+        same schedule, time spent by the consumer counts against the period.
+        max_cycles: stop after this many reads in this call (None runs forever)
+        """
+        schedule = FixedRate()
+        count = 0
+        while max_cycles is None or count < max_cycles:
+            yield self.read()
+            count += 1
+            if max_cycles is not None and count >= max_cycles:
+                break
+            self.missed_deadlines += schedule.wait(self.period())
 
-def look_for_everything():
-    headers = ["Score", "Goals", "Assists", "Saves", "Shots"]
+    def run(self, callback=None, max_cycles=None):
+        """
+        callback: called with the values of every cycle
+        max_cycles: stop after this many reads in this call (None runs forever)
+        """
+        for values in self.iter_values(max_cycles):
+            if callback:
+                callback(values)
+
+    def stats(self):
+        stats = {
+            "cycles": self.cycles,
+            "missed_deadlines": self.missed_deadlines,
+            "idle": self.is_idle(),
+            "hz": 1.0 / self.period(),
+        }
+        if self.changes is not None:
+            stats["unchanged_cells"] = self.changes.stats()
+        if self.glyph_cache is not None:
+            stats["glyph_cache"] = self.glyph_cache.stats()
+        if self.archive is not None:
+            stats["archive"] = self.archive.stats()
+        if self.timing is not None:
+            stats["timing"] = self.timing.snapshot()
+        return stats
+
+def read_board(sct):
+    # One-off read of the default board with an existing mss session
+    return ScoreboardReader(sct=sct, save_cells=True).read()
+
+def print_board(values):
+    headers = HEADERS
     col_width = 12
     format_str = "| " + " | ".join([f"{{:<{col_width}}}" for _ in headers]) + " |"
     separator = "-" * len(format_str.format(*headers))
@@ -178,28 +477,18 @@ def look_for_everything():
     print(separator)
 
     # Note: Iterate rows first (Players) then columns (Stats) for correct table orientation
-    for i, row_start in enumerate(specs_rows):
-        # Determine text color based on row index
-        # First two rows: rgb(247,253,255), Last two rows: rgb(255, 244, 174)
-        if i < 2:
-            color = (247, 253, 255)
-        else:
-            color = (255, 244, 174)
-
-        row_values = []
-        row_end = row_start + specs_rect[1]
-        for j, col_start in enumerate(specs_columns):
-            col_end = col_start + specs_rect[0]
-            num = look_for_number([col_start, col_end], [row_start, row_end], expected_rgb=color, col_idx=j, row_idx=i)
-            row_values.append(num if num else "")
+    for row_values in values:
         print(format_str.format(*row_values))
     print(separator)
+
+def look_for_everything():
+    with mss.mss() as sct:
+        values = read_board(sct)
+    print_board(values)
     
 
 if __name__ == "__main__":
-    target_x_range = [2026, 2026 + 159]
-    target_y_range = [1923, 1923 + 48]
-
-    while True:
-        time.sleep(4)    
-        look_for_everything()
+    # Debug captures go to ./captures in the background, at most 20 per second
+    with CaptureArchive("captures", max_per_second=20) as archive:
+        with ScoreboardReader(target_hz=10, idle_hz=0.25, archive=archive) as reader:
+            reader.run(print_board)
@@ -0,0 +1,246 @@
+"""
+Watching scoreboards on several monitors at once.
+
+MonitorCache keeps the monitor geometry (the list m.list_monitors() prints)
+and re-queries it at most every refresh_every seconds; `version` goes up
+when a monitor was added, removed, moved or resized, so placements are only
+recomputed then. mss sessions cache their monitor list, so a refresh opens
+a fresh session.
+
+MultiMonitorCapture grabs each monitor on its own thread (with its own mss
+session, they can't be shared between threads) on a fixed schedule and puts
+SourceFrames, stamped with their grab time and a per-source sequence
+number, into one shared queue. watch() is the shared recognition stage: one
+ScoreboardReader per source, fed with read_frame().
+
+    python monitors.py --monitors 1 2 --hz 5 --changes --out -
+"""
+import argparse
+import queue
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+import mss
+
+import mm
+from capture import board_region, grab_frame
+from layout import DEFAULT_LAYOUT, calibrate
+from stream import NdjsonWriter, diff_readings, to_reading
+from timing import FixedRate
+
+# source: BoardSource name, seq: per-source frame number, time: wall clock of the grab,
+# placement: absolute layout.Placement the frame was grabbed at (frame covers its board_region)
+SourceFrame = namedtuple("SourceFrame", ["source", "monitor", "seq", "time", "placement", "frame"])
+SourceReading = namedtuple("SourceReading", ["source", "reading"])
+
+_END = object()
+
+
+class MonitorCache:
+    # Monitor geometry, sct.monitors order: 0 = all monitors combined, 1.. = single monitors
+
+    def __init__(self, refresh_every=2.0):
+        self.refresh_every = refresh_every
+        self.monitors = []
+        self.version = 0
+        self._checked = float("-inf")
+        self._lock = threading.Lock()
+        self.refresh(force=True)
+
+    def _query(self):
+        with mss.mss() as sct:
+            return [dict(monitor) for monitor in sct.monitors]
+
+    def refresh(self, force=False):
+        # Re-query if refresh_every has passed (or force), returns True if the geometry changed
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._checked < self.refresh_every:
+                return False
+            self._checked = now
+        monitors = self._query()
+        with self._lock:
+            if monitors == self.monitors:
+                return False
+            self.monitors = monitors
+            self.version += 1
+            return True
+
+    def get(self, monitor_idx):
+        # returns: mss monitor dict, None if there is no such monitor (anymore)
+        monitors = self.monitors
+        return monitors[monitor_idx] if 0 <= monitor_idx < len(monitors) else None
+
+
+class BoardSource:
+    """
+    name: label of the board in the output, e.g. "left" / "right"
+    monitor_idx: index as in m.list_monitors() (1 = first monitor)
+    layout: where the board sits on the monitor, see layout.py
+    calibrated: locate the board with layout.calibrate() (cached per resolution)
+                instead of only scaling the layout
+    """
+
+    def __init__(self, name, monitor_idx, layout=DEFAULT_LAYOUT, calibrated=False):
+        self.name = name
+        self.monitor_idx = monitor_idx
+        self.layout = layout
+        self.calibrated = calibrated
+
+    def place(self, sct, monitor):
+        if self.calibrated:
+            return calibrate(sct, monitor, self.layout)
+        return self.layout.place(monitor)
+
+
+class MultiMonitorCapture:
+    """
+    sources: BoardSources, any number per monitor
+    hz: grabs per second of every source
+    monitors: MonitorCache to share, a new one by default
+    Iterating yields SourceFrames of all sources in arrival order until close().
+    """
+
+    def __init__(self, sources, hz=10.0, monitors=None, queue_size=64):
+        self.sources = list(sources)
+        self.hz = hz
+        self.monitors = monitors or MonitorCache()
+        self.queue_size = queue_size
+        self.grabs = defaultdict(int)
+        self.missed_deadlines = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()  # missed_deadlines, one grab thread per monitor
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _grab_loop(self, monitor_idx, sources):
+        period = 1.0 / self.hz
+        version, placements = None, {}
+        with mss.mss() as sct:
+            schedule = FixedRate()
+            while not self._stop.is_set():
+                self.monitors.refresh()
+                if self.monitors.version != version:
+                    version = self.monitors.version
+                    monitor = self.monitors.get(monitor_idx)
+                    if monitor is None:
+                        print(f"Warning: monitor {monitor_idx} is gone, not grabbing it until it is back.")
+                        placements = {}
+                    else:
+                        placements = {s.name: s.place(sct, monitor) for s in sources}
+
+                for source in sources:
+                    placement = placements.get(source.name)
+                    if placement is None:
+                        continue
+                    grabbed = time.time()
+                    frame = grab_frame(sct, board_region(*placement))
+                    self.grabs[source.name] += 1
+                    if not self._put(SourceFrame(source.name, monitor_idx, self.grabs[source.name],
+                                                 grabbed, placement, frame)):
+                        return
+
+                missed = schedule.wait(period, self._stop)
+                with self._lock:
+                    self.missed_deadlines += missed
+
+    def start(self):
+        by_monitor = defaultdict(list)
+        for source in self.sources:
+            by_monitor[source.monitor_idx].append(source)
+        self._stop.clear()
+        for monitor_idx, sources in sorted(by_monitor.items()):
+            thread = threading.Thread(target=self._grab_loop, args=(monitor_idx, sources),
+                                      name=f"grab-monitor-{monitor_idx}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def close(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        # Wake up a consumer blocked in __iter__
+        try:
+            self._queue.put_nowait(_END)
+        except queue.Full:
+            pass
+
+    def __iter__(self):
+        if not self._threads and not self._stop.is_set():
+            self.start()
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                return
+            yield item
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self):
+        return {"grabs": dict(self.grabs), "queued": self._queue.qsize(),
+                "missed_deadlines": self.missed_deadlines, "monitor_version": self.monitors.version}
+
+
+def watch(frames, max_frames=None, **reader_kwargs):
+    """
+    frames: iterable of SourceFrame, e.g. a MultiMonitorCapture
+    reader_kwargs: passed to every source's ScoreboardReader (classifier, timing, ...)
+    yields: SourceReading per frame, reading.time is the grab time, reading.cycle the source's seq
+    """
+    readers = {}
+    try:
+        for count, item in enumerate(frames, start=1):
+            reader = readers.get(item.source)
+            if reader is None or (reader.columns, reader.rows, reader.rect) != tuple(item.placement):
+                # New source or its monitor changed: a reader for the new placement
+                if reader is not None:
+                    reader.close()
+                reader = readers[item.source] = mm.ScoreboardReader(*item.placement, **reader_kwargs)
+            values = reader.read_frame(item.frame)
+            yield SourceReading(item.source, to_reading(values, item.seq, item.time))
+            if max_frames is not None and count >= max_frames:
+                return
+    finally:
+        # Also runs when the consumer stops iterating (generator close), readers may hold process pools
+        for reader in readers.values():
+            reader.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read scoreboards on several monitors at once")
+    parser.add_argument("--monitors", type=int, nargs="+", default=[1], help="monitor indices, see m.py")
+    parser.add_argument("--hz", type=float, default=5.0)
+    parser.add_argument("--calibrate", action="store_true", help="locate each board (layout.calibrate)")
+    parser.add_argument("--changes", action="store_true", help="write only cell change events")
+    parser.add_argument("--out", default="-", help="NDJSON file, - for stdout")
+    args = parser.parse_args()
+
+    sources = [BoardSource(f"monitor{idx}", idx, calibrated=args.calibrate) for idx in args.monitors]
+    last = {}
+    with MultiMonitorCapture(sources, hz=args.hz) as capture, NdjsonWriter(args.out) as writer:
+        try:
+            for source, reading in watch(capture):
+                if args.changes:
+                    for event in diff_readings(last.get(source), reading):
+                        writer.write(event, source=source)
+                    last[source] = reading
+                else:
+                    writer.write(reading, source=source)
+        except KeyboardInterrupt:
+            pass
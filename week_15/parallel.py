@@ -0,0 +1,89 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+import mm
+from glyph_cache import GlyphCache
+from tesseract_batch import read_masks_with_tesseract
+
+# Set in each worker process by _init_worker
+_classifier = None
+_cache = None
+
+
+def init_worker_process():
+    # One OpenCV thread per worker, the pool already uses every core
+    cv2.setNumThreads(1)
+
+
+def _init_worker(classifier):
+    # Runs once per worker: templates come from the parent (or the on-disk cache), never per task
+    global _classifier, _cache
+    init_worker_process()
+    if classifier is None:
+        mm.init_templates()
+        classifier = mm.CLASSIFIER
+    _classifier = classifier
+    _cache = GlyphCache()
+
+
+def _recognize_masks(masks):
+    if _classifier is not None and len(_classifier):
+        return mm.recognize_masks(masks, _classifier, _cache)
+    return read_masks_with_tesseract(masks)
+
+
+def _read_cells(items):
+    # items: list of (bgra cell, expected_rgb), binarized in the worker as well
+    return _recognize_masks([mm.binarize_cell(cell, expected_rgb) for cell, expected_rgb in items])
+
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class ParallelRecognizer:
+    """
+    Process pool for recognition. Each worker gets the classifier once at
+    start-up; work is sent in chunks of at least min_chunk items so pickling
+    and IPC stay small next to the actual recognition. Results keep input order.
+
+    Only pays off with many cells per call (dense boards, recorded frames),
+    a 20-cell board is recognized faster in-process.
+    """
+
+    def __init__(self, workers=None, classifier=None, min_chunk=16):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_chunk = min_chunk
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                         initargs=(classifier,))
+
+    def _chunk_size(self, n):
+        # About two chunks per worker so a slow chunk doesn't leave the others idle
+        return max(self.min_chunk, -(-n // (self.workers * 2)))
+
+    def _map(self, fn, items):
+        if not items:
+            return []
+        results = []
+        for chunk_result in self._pool.map(fn, _chunks(items, self._chunk_size(len(items)))):
+            results.extend(chunk_result)
+        return results
+
+    def recognize(self, masks):
+        # masks: list of binary masks -> list of strings
+        return self._map(_recognize_masks, list(masks))
+
+    def read_cells(self, cells, colors):
+        # cells: list of BGRA cells, colors: expected_rgb per cell (or None for Otsu)
+        return self._map(_read_cells, list(zip(cells, colors)))
+
+    def close(self):
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
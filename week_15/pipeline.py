@@ -0,0 +1,232 @@
+"""
+Pipelined reading: capture, recognition and output on their own threads.
+
+ScoreboardReader.run() grabs, recognizes and calls back in lockstep, so a
+slow classification delays the next grab. Pipeline splits that up:
+
+    capture thread -> frames queue -> recognition workers -> results queue -> sink
+
+Both queues are bounded and drop their oldest entry when full, so when
+recognition falls behind, stale frames are thrown away instead of piling
+up, and grab-to-result latency stays at about (queue size + workers)
+recognitions. Every worker has its own ScoreboardReader (readers keep per
+cell state and are not thread safe); cv2 and NumPy release the GIL, so
+workers overlap. Results from different workers can finish out of order,
+the sink skips any older than the last one it delivered.
+
+    with Pipeline(workers=2, target_hz=10) as pipeline:
+        pipeline.run(lambda reading: mm.print_board(reading.text))
+"""
+import argparse
+import sys
+import threading
+import time
+from collections import deque
+
+import mss
+
+import mm
+from capture import grab_frame
+from stream import NdjsonWriter, to_reading
+from timing import FixedRate, LatencyHistogram
+
+
+class DropOldestQueue:
+    # Bounded FIFO whose put() never blocks: when full, the oldest item makes room
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.put_count = 0
+        self.dropped = 0
+        self.closed = False
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self.put_count += 1
+            self._cond.notify()
+
+    def get(self):
+        # returns: the oldest item, None once closed and empty
+        with self._cond:
+            while not self._items and not self.closed:
+                self._cond.wait()
+            return self._items.popleft() if self._items else None
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        return {"depth": len(self._items), "maxsize": self.maxsize, "put": self.put_count,
+                "dropped": self.dropped}
+
+
+class Pipeline:
+    """
+    workers: recognition threads, each with its own ScoreboardReader(**reader_kwargs)
+    frames_queue / results_queue: queue sizes, small keeps results fresh
+    target_hz / idle_hz / idle_after: grab schedule, as in ScoreboardReader.run()
+    sct_factory: returns the mss session to grab with (default mss.mss), called on
+                 the capture thread since sessions can't move between threads
+    reader_kwargs: e.g. columns, rows, rect, classifier, archive; don't pass one
+                   PipelineTimer as timing, its laps assume a single thread
+    """
+
+    def __init__(self, workers=2, frames_queue=2, results_queue=4, target_hz=10.0, idle_hz=1.0,
+                 idle_after=5.0, sct_factory=None, **reader_kwargs):
+        self.readers = [mm.ScoreboardReader(target_hz=target_hz, idle_hz=idle_hz, idle_after=idle_after,
+                                            **reader_kwargs) for _ in range(max(1, workers))]
+        self.region = self.readers[0].region
+        self.frames = DropOldestQueue(frames_queue)
+        self.results = DropOldestQueue(results_queue)
+        self.sct_factory = sct_factory or mss.mss
+        self.grabs = 0
+        self.missed_deadlines = 0
+        self.stale = 0
+        self.delivered = 0
+        self.latency = LatencyHistogram()  # grab to result delivered to the sink
+        self._last_seq = 0
+        self._stop = threading.Event()
+        self._threads = []
+        self._workers_left = 0
+        self._lock = threading.Lock()
+
+    def period(self):
+        # Idle only when every worker's reader is idle (each sees a share of the frames)
+        return min(reader.period() for reader in self.readers)
+
+    def _capture(self):
+        sct = self.sct_factory()
+        try:
+            schedule = FixedRate()
+            while not self._stop.is_set():
+                grabbed = time.time()
+                grabbed_at = time.perf_counter()
+                frame = grab_frame(sct, self.region)
+                self.grabs += 1
+                self.frames.put((self.grabs, grabbed, grabbed_at, frame))
+                self.missed_deadlines += schedule.wait(self.period(), self._stop)
+        finally:
+            sct.close()
+            self.frames.close()
+
+    def _recognize(self, reader):
+        try:
+            while True:
+                item = self.frames.get()
+                if item is None:
+                    return
+                seq, grabbed, grabbed_at, frame = item
+                values = reader.read_frame(frame)
+                self.results.put((to_reading(values, seq, grabbed), grabbed_at))
+        finally:
+            with self._lock:
+                self._workers_left -= 1
+                if self._workers_left == 0:
+                    self.results.close()
+
+    def start(self):
+        self._stop.clear()
+        self._workers_left = len(self.readers)
+        self._threads = [threading.Thread(target=self._capture, name="pipeline-capture", daemon=True)]
+        self._threads += [threading.Thread(target=self._recognize, args=(reader,), name=f"pipeline-worker-{i}",
+                                           daemon=True) for i, reader in enumerate(self.readers)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        for reader in self.readers:
+            reader.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        """
+        The sink stage: yields stream.Readings, newest last, until close().
+        reading.time is the grab time, reading.cycle the frame's sequence number.
+        """
+        if not self._threads:
+            self.start()
+        while True:
+            item = self.results.get()
+            if item is None:
+                return
+            reading, grabbed_at = item
+            if reading.cycle <= self._last_seq:
+                # A worker finished an older frame after a newer one was delivered
+                self.stale += 1
+                continue
+            self._last_seq = reading.cycle
+            self.latency.add(time.perf_counter() - grabbed_at)
+            self.delivered += 1
+            yield reading
+
+    def run(self, callback=None, max_results=None):
+        """
+        callback: called with every delivered Reading, on the calling thread
+        max_results: stop after this many (None runs until close())
+        """
+        for reading in self:
+            if callback:
+                callback(reading)
+            if max_results is not None and self.delivered >= max_results:
+                break
+
+    def stats(self):
+        return {
+            "grabs": self.grabs,
+            "delivered": self.delivered,
+            "missed_deadlines": self.missed_deadlines,
+            "hz": 1.0 / self.period(),
+            "frames_queue": self.frames.stats(),
+            "results_queue": self.results.stats(),
+            "stale_results": self.stale,
+            "latency": self.latency.summary(),
+            "worker_cycles": [reader.cycles for reader in self.readers],
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read the scoreboard with pipelined capture / recognition")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--hz", type=float, default=10.0)
+    parser.add_argument("--out", help="NDJSON file (- for stdout) instead of printing the board")
+    parser.add_argument("--stats-every", type=float, default=10.0, help="seconds between stats on stderr")
+    args = parser.parse_args()
+
+    with Pipeline(workers=args.workers, target_hz=args.hz, idle_hz=args.hz) as pipeline:
+        writer = NdjsonWriter(args.out) if args.out else None
+        next_stats = time.monotonic() + args.stats_every
+        try:
+            for reading in pipeline:
+                if writer:
+                    writer.write(reading)
+                else:
+                    mm.print_board(reading.text)
+                if time.monotonic() >= next_stats:
+                    print(pipeline.stats(), file=sys.stderr)
+                    next_stats += args.stats_every
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if writer:
+                writer.close()
@@ -0,0 +1,229 @@
+"""
+Replays recorded captures through the reader pipeline as fast as possible,
+e.g. to re-check a whole session after a template change.
+
+Sources can be mixed, directories are expanded to the files in them:
+  - cell images named {col}_{row}_{value}.png (mm.save_cell), value is the label
+  - other images: whole board frames (the size of the board region) or single cells
+  - CaptureArchive directories / captures_*.npz chunks (labels from the index)
+
+Images are decoded ahead on a thread pool while the previous batch is being
+recognized; with --workers N each worker process loads and recognizes its own
+share of the files instead.
+
+    python replay.py imgs captures --workers 4 --mismatches mismatches.csv
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+import mm
+from parallel import init_worker_process
+
+CELL_NAME = re.compile(r"^(\d+)_(\d+)_([\d.]*)$")  # {col}_{row}_{value}
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+# label is None when the source doesn't say what the cell shows, col / row when it says where it was
+Item = namedtuple("Item", ["name", "img", "label", "col", "row"])
+# kind: "cell" (value is the text) or "frame" (value is values[row_idx][col_idx])
+Result = namedtuple("Result", ["name", "kind", "label", "value"])
+
+
+def list_sources(paths):
+    # returns: image files and archive chunks, each directory in name order
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(os.listdir(path))
+            sources += [os.path.join(path, n) for n in names if n.lower().endswith(IMAGE_EXTENSIONS)]
+            sources += sorted(glob.glob(os.path.join(path, "captures_*.npz")))
+        else:
+            sources.append(path)
+    return sources
+
+
+def _to_bgra(img):
+    if img.ndim == 2:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGRA)
+    if img.shape[2] == 3:
+        return cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
+    return img
+
+
+def load_source(path):
+    # returns: list of Items, an archive chunk holds many
+    if path.endswith(".npz"):
+        name = os.path.basename(path)
+        with np.load(path) as data:
+            index = json.loads(str(data["index"]))
+            return [Item(f"{name}#{i}", data[f"img_{i}"], entry["value"], entry["col"], entry["row"])
+                    for i, entry in enumerate(index)]
+
+    img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if img is None:
+        print(f"Warning: could not read {path}")
+        return []
+    match = CELL_NAME.match(os.path.splitext(os.path.basename(path))[0])
+    if match:
+        return [Item(path, _to_bgra(img), match.group(3), int(match.group(1)), int(match.group(2)))]
+    return [Item(path, _to_bgra(img), None, None, None)]
+
+
+def prefetch(fn, items, threads=4, depth=16):
+    # Like map(fn, items), with up to `depth` calls running ahead on a thread pool
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= depth:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class Replayer:
+    """
+    Recognizes Items with a ScoreboardReader that never grabs: images the
+    size of the board region go through read_frame(), everything else is a
+    cell, binarized with its row's color and recognized in one batch.
+    """
+
+    def __init__(self, classifier=None, decoder=None):
+        self.reader = mm.ScoreboardReader(classifier=classifier, decoder=decoder)
+        self.frame_shape = (self.reader.region["height"], self.reader.region["width"])
+
+    def _color(self, row):
+        if row is None or not 0 <= row < len(self.reader.rows):
+            return None
+        return mm.row_color(row)
+
+    def process(self, items):
+        # returns: list of Result, same order as items
+        results = [None] * len(items)
+        pending = []
+        for k, item in enumerate(items):
+            if item.img.shape[:2] == self.frame_shape:
+                values = self.reader.read_frame(np.ascontiguousarray(item.img))
+                results[k] = Result(item.name, "frame", item.label, values)
+            else:
+                pending.append((k, mm.binarize_cell(item.img, self._color(item.row))))
+
+        texts = self.reader.recognize([mask for _, mask in pending])
+        for (k, _), text in zip(pending, texts):
+            results[k] = Result(items[k].name, "cell", items[k].label, text)
+        return results
+
+    def close(self):
+        self.reader.close()
+
+
+# Set in each worker process by _init_worker
+_replayer = None
+
+
+def _init_worker(classifier, decoder):
+    global _replayer
+    init_worker_process()
+    _replayer = Replayer(classifier, decoder)
+
+
+def _replay_sources(paths):
+    return _replayer.process([item for path in paths for item in load_source(path)])
+
+
+def replay(paths, workers=None, batch_size=256, threads=4, classifier=None, decoder=None):
+    """
+    paths: files and / or directories, see the module docstring
+    workers: recognize in that many processes (None / 1 = in this process)
+    yields: Result per item, in source order
+    """
+    sources = list_sources(paths)
+    if workers and workers > 1:
+        # Workers load their files themselves, only paths and results cross processes
+        chunk = max(1, min(64, -(-len(sources) // (workers * 4))))
+        chunks = [sources[i:i + chunk] for i in range(0, len(sources), chunk)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(classifier, decoder)) as pool:
+            for results in pool.map(_replay_sources, chunks):
+                yield from results
+        return
+
+    replayer = Replayer(classifier, decoder)
+    batch = []
+    for items in prefetch(load_source, sources, threads, depth=4 * threads):
+        batch.extend(items)
+        if len(batch) >= batch_size:
+            yield from replayer.process(batch)
+            batch = []
+    if batch:
+        yield from replayer.process(batch)
+    replayer.close()
+
+
+class ReplayReport:
+    # Throughput and, where the sources carry labels, accuracy of a replay
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+        self.cells = 0
+        self.frames = 0
+        self.labelled = 0
+        self.correct = 0
+        self.mismatches = []
+
+    def add(self, result):
+        if result.kind == "frame":
+            self.frames += 1
+            return
+        self.cells += 1
+        if result.label is not None:
+            self.labelled += 1
+            if result.value == result.label:
+                self.correct += 1
+            else:
+                self.mismatches.append(result)
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.start
+        return self
+
+    def summary(self):
+        elapsed = max(self.elapsed, 1e-9)
+        cells = self.cells + self.frames * len(mm.specs_rows) * len(mm.specs_columns)
+        lines = [f"Replayed {self.cells} cells and {self.frames} frames in {elapsed:.2f} s: "
+                 f"{(self.cells + self.frames) / elapsed:.0f} images/s, {cells / elapsed:.0f} cells/s"]
+        if self.labelled:
+            lines.append(f"Labelled cells: {self.labelled}, accuracy {self.correct / self.labelled:.1%}, "
+                         f"{len(self.mismatches)} mismatches")
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded frames / cells through the reader")
+    parser.add_argument("paths", nargs="+", help="image files, image directories, capture archives")
+    parser.add_argument("--workers", type=int, default=1, help="recognition processes")
+    parser.add_argument("--threads", type=int, default=4, help="image decode threads (1 worker)")
+    parser.add_argument("--mismatches", help="CSV file for labelled cells that read differently")
+    args = parser.parse_args()
+
+    report = ReplayReport()
+    for result in replay(args.paths, args.workers, threads=args.threads):
+        report.add(result)
+    print(report.finish().summary())
+
+    if args.mismatches:
+        with open(args.mismatches, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["name", "label", "read"])
+            writer.writerows((r.name, r.label, r.value) for r in report.mismatches)
+        print(f"Wrote {args.mismatches}")
@@ -0,0 +1,158 @@
+"""
+Character segmentation for binarized cells (white text on black).
+
+Every engine returns, per mask, a list of (x, y, w, h, roi) tuples sorted left
+to right, with roi a view into the mask. "components" is the default:
+connected-component statistics for all masks of a frame in one OpenCV call,
+with filtering, sorting and grouping done in NumPy. "contours" is the old
+findContours path from mm.py.
+"""
+import cv2
+import numpy as np
+
+MIN_CHAR_HEIGHT = 10    # same limits as the old contour filter (h > 10 and w > 2)
+MIN_CHAR_WIDTH = 2
+MIN_AREA = 3            # components smaller than this are noise
+MERGE_OVERLAP = 0.5     # pieces overlapping this much of their width in x are one glyph
+DOT_MIN_SIZE = 0.1      # decimal point: at least this fraction of the digit height wide and tall,
+DOT_MAX_HEIGHT = 0.4    # at most this fraction ...
+DOT_BASELINE = 0.15     # ... with its bottom this close (fraction of digit height) to the baseline
+
+# Spaghetti labelling is the fastest on these small masks, older OpenCV builds lack it
+CCL_ALGORITHM = getattr(cv2, "CCL_SPAGHETTI", cv2.CCL_DEFAULT)
+
+
+def segment_contours(thresh):
+    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    # Filter contours by size/area to remove noise
+    char_rois = []
+    for c in contours:
+        x, y, w, h = cv2.boundingRect(c)
+        if h > MIN_CHAR_HEIGHT and w > MIN_CHAR_WIDTH: # Minimal size filter
+            char_rois.append((x, y, w, h, thresh[y:y+h, x:x+w]))
+
+    # Sort by x coordinate (left to right)
+    char_rois.sort(key=lambda r: r[0])
+    return char_rois
+
+
+def _group_components(stats, cell_of):
+    """
+    stats: (n, 5) x, y, w, h, area of the components, sorted by x within a
+           mosaic where cells never overlap in x
+    returns: (n_groups, 4) boxes and the cell of every group
+    """
+    x, y, w, h = stats[:, 0], stats[:, 1], stats[:, 2], stats[:, 3]
+    right = x + w
+    bottom = y + h
+
+    # A component starts a new glyph unless it overlaps the glyph to its left by
+    # more than MERGE_OVERLAP of the narrower of it and its left neighbour
+    # (digits broken into pieces, in either order)
+    prev_right = np.maximum.accumulate(right)
+    prev_right = np.concatenate([[-1], prev_right[:-1]])
+    narrower = np.minimum(w, np.concatenate([[w[0]], w[:-1]]))
+    starts = (prev_right - x) < MERGE_OVERLAP * narrower
+    starts[0] = True
+    starts |= np.concatenate([[True], cell_of[1:] != cell_of[:-1]])
+
+    first = np.flatnonzero(starts)
+    boxes = np.stack([
+        np.minimum.reduceat(x, first),
+        np.minimum.reduceat(y, first),
+        np.maximum.reduceat(right, first),
+        np.maximum.reduceat(bottom, first),
+    ], axis=1)
+    return boxes, cell_of[first]
+
+
+def _keep_glyphs(boxes, group_cell, n_cells):
+    # Digits by size, plus decimal points sitting on the baseline of their cell's digits
+    w = boxes[:, 2] - boxes[:, 0]
+    h = boxes[:, 3] - boxes[:, 1]
+    tall = (h > MIN_CHAR_HEIGHT) & (w > MIN_CHAR_WIDTH)
+
+    digit_h = np.zeros(n_cells)
+    baseline = np.zeros(n_cells)
+    np.maximum.at(digit_h, group_cell[tall], h[tall])
+    np.maximum.at(baseline, group_cell[tall], boxes[tall, 3])
+
+    cell_h = digit_h[group_cell]
+    dot = (
+        ~tall
+        & (cell_h > 0)
+        & (h >= DOT_MIN_SIZE * cell_h) & (w >= DOT_MIN_SIZE * cell_h)
+        & (h <= DOT_MAX_HEIGHT * cell_h)
+        & (w <= DOT_MAX_HEIGHT * cell_h)
+        & (np.abs(baseline[group_cell] - boxes[:, 3]) <= DOT_BASELINE * cell_h)
+        & (w <= 2 * h) & (h <= 2 * w)
+    )
+    return tall | dot
+
+
+def segment_masks(masks):
+    """
+    Segments all masks with one connectedComponentsWithStats call.
+    masks: list of binary masks of equal height
+    returns: list (one per mask) of [(x, y, w, h, roi), ...] left to right
+    """
+    if not masks:
+        return []
+    heights = {m.shape[0] for m in masks}
+    if len(heights) != 1:
+        return [segment_masks([m])[0] for m in masks]
+
+    # Side by side with a black column between them, so no component spans two cells
+    widths = np.array([m.shape[1] for m in masks])
+    offsets = np.concatenate([[0], np.cumsum(widths + 1)[:-1]])
+    if len(masks) == 1:
+        mosaic = masks[0]
+    else:
+        mosaic = np.zeros((heights.pop(), int(widths.sum() + len(masks) - 1)), dtype=np.uint8)
+        for mask, offset in zip(masks, offsets):
+            mosaic[:, offset:offset + mask.shape[1]] = mask
+
+    # 16 bit labels are enough unless the mosaic could hold more than 65535 components
+    label_type = cv2.CV_16U if mosaic.size < 4 * 65535 else cv2.CV_32S
+    _, _, stats, _ = cv2.connectedComponentsWithStatsWithAlgorithm(mosaic, 8, label_type, CCL_ALGORITHM)
+    stats = stats[1:]  # label 0 is the background
+    stats = stats[stats[:, 4] >= MIN_AREA]
+    results = [[] for _ in masks]
+    if len(stats) == 0:
+        return results
+
+    stats = stats[np.argsort(stats[:, 0], kind="stable")]
+    cell_of = np.searchsorted(offsets, stats[:, 0], side="right") - 1
+
+    boxes, group_cell = _group_components(stats, cell_of)
+    keep = _keep_glyphs(boxes, group_cell, len(masks))
+    boxes, group_cell = boxes[keep], group_cell[keep]
+
+    # Back to cell coordinates; groups are already sorted by x within each cell
+    boxes[:, [0, 2]] -= offsets[group_cell][:, None]
+    for (x1, y1, x2, y2), cell in zip(boxes.tolist(), group_cell.tolist()):
+        results[cell].append((x1, y1, x2 - x1, y2 - y1, masks[cell][y1:y2, x1:x2]))
+    return results
+
+
+def segment_components(thresh):
+    return segment_masks([thresh])[0]
+
+
+ENGINES = {
+    "components": segment_components,
+    "contours": segment_contours,
+}
+DEFAULT_ENGINE = "components"
+
+
+def segment(thresh, engine=DEFAULT_ENGINE):
+    return ENGINES[engine](thresh)
+
+
+def segment_all(masks, engine=DEFAULT_ENGINE):
+    # Batch version of segment(), the components engine does the whole batch at once
+    if engine == "components":
+        return segment_masks(masks)
+    return [ENGINES[engine](mask) for mask in masks]
@@ -0,0 +1,175 @@
+"""
+Streaming scoreboard API, for consumers that want data instead of the table
+print_board() prints.
+
+readings() yields one timestamped Reading per cycle with the numbers parsed
+to int / float, changes() turns readings into CellChange events (old and new
+value of every cell that changed), areadings() / achanges() are the asyncio
+versions, and NdjsonWriter writes either kind as one JSON object per line.
+
+    python stream.py --changes --out -          # deltas as NDJSON on stdout
+    python stream.py --out board.ndjson --hz 5  # every reading to a file
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import mm
+
+# values[row_idx][col_idx]: int, float or None (empty / unreadable), text: raw OCR strings
+Reading = namedtuple("Reading", ["time", "cycle", "values", "text"])
+# Every cell whose parsed value differs from the previous reading
+CellChange = namedtuple("CellChange", ["time", "cycle", "row", "col", "column", "old", "new", "text"])
+
+
+def parse_value(text):
+    # "481" -> 481, "1.5" -> 1.5, "" or garbage like "1.2." -> None
+    if not text:
+        return None
+    try:
+        return int(text) if "." not in text else float(text)
+    except ValueError:
+        return None
+
+
+def to_reading(values, cycle, timestamp=None):
+    return Reading(
+        time=timestamp if timestamp is not None else time.time(),
+        cycle=cycle,
+        values=[[parse_value(text) for text in row] for row in values],
+        text=[list(row) for row in values],
+    )
+
+
+def readings(reader, max_cycles=None):
+    """
+    reader: ScoreboardReader, read on its own schedule (target_hz / idle_hz)
+    yields: Reading per cycle
+    """
+    for values in reader.iter_values(max_cycles):
+        yield to_reading(values, reader.cycles, reader.read_time)
+
+
+def diff_readings(old, new, headers=mm.HEADERS):
+    """
+    old: previous Reading or None (then every cell counts as changed, old=None)
+    returns: list of CellChange from old to new
+    """
+    events = []
+    for i, row in enumerate(new.values):
+        for j, value in enumerate(row):
+            before = old.values[i][j] if old is not None else None
+            if old is not None and before == value and type(before) is type(value):
+                continue
+            events.append(CellChange(new.time, new.cycle, i, j, headers[j] if j < len(headers) else str(j),
+                                     before, value, new.text[i][j]))
+    return events
+
+
+def changes(readings_iter, headers=mm.HEADERS):
+    # readings_iter: iterable of Reading -> yields CellChange, the first reading reports every cell
+    last = None
+    for reading in readings_iter:
+        yield from diff_readings(last, reading, headers)
+        last = reading
+
+
+async def areadings(reader, max_cycles=None):
+    """
+    Async iterator over readings(); grabbing, recognition and the schedule's
+    sleeps run in a worker thread so the event loop stays free. Always the
+    same thread: mss sessions only work on the thread that opened them, so
+    the reader must not be open yet (no `with reader:`, no sct=); its session
+    is opened on that thread and closed there at the end.
+    """
+    if reader.sct is not None:
+        raise ValueError("areadings() needs a reader without an open mss session, "
+                         "it opens one on its own thread")
+    it = readings(reader, max_cycles)
+    done = object()
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="stream-reader") as executor:
+        await loop.run_in_executor(executor, reader.open)
+        try:
+            while True:
+                reading = await loop.run_in_executor(executor, next, it, done)
+                if reading is done:
+                    return
+                yield reading
+        finally:
+            await loop.run_in_executor(executor, reader.close_session)
+
+
+async def achanges(reader, max_cycles=None, headers=mm.HEADERS):
+    last = None
+    async for reading in areadings(reader, max_cycles):
+        for event in diff_readings(last, reading, headers):
+            yield event
+        last = reading
+
+
+class NdjsonWriter:
+    """
+    Writes Readings / CellChanges as newline delimited JSON, one object per
+    line with a "type" field ("reading" or "change") and, when given, the
+    "source" board, flushed per write so a pipe reader sees every event right away.
+
+    out: path, "-" for stdout, or an open text file
+    """
+
+    def __init__(self, out="-"):
+        if out == "-":
+            self.file, self._owns_file = sys.stdout, False
+        elif isinstance(out, str):
+            self.file, self._owns_file = open(out, "a", encoding="utf-8"), True
+        else:
+            self.file, self._owns_file = out, False
+        self.written = 0
+
+    def write(self, event, source=None):
+        # source: optional name of the board the event is from (see monitors.py)
+        record = {"type": "reading" if isinstance(event, Reading) else "change"}
+        if source is not None:
+            record["source"] = source
+        record.update(event._asdict())
+        self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.file.flush()
+        self.written += 1
+
+    def write_all(self, events):
+        for event in events:
+            self.write(event)
+
+    def close(self):
+        if self._owns_file:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream scoreboard readings as NDJSON")
+    parser.add_argument("--out", default="-", help="file to append to, - for stdout")
+    parser.add_argument("--changes", action="store_true", help="write only cell change events")
+    parser.add_argument("--hz", type=float, default=10.0)
+    parser.add_argument("--idle-hz", type=float, default=1.0)
+    parser.add_argument("--cycles", type=int, help="stop after this many reads")
+    args = parser.parse_args()
+
+    with NdjsonWriter(args.out) as writer, \
+            mm.ScoreboardReader(target_hz=args.hz, idle_hz=args.idle_hz) as reader:
+        events = readings(reader, args.cycles)
+        if args.changes:
+            events = changes(events)
+        try:
+            writer.write_all(events)
+        except KeyboardInterrupt:
+            pass
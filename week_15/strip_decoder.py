@@ -0,0 +1,197 @@
+"""
+Segmentation-free digit decoder, grown out of the sliding-window prototype in
+mm_imgs_nb.ipynb.
+
+Instead of cutting the mask into glyphs first, every template is slid across
+the whole binarized strip at once: all windows of the strip go into one matrix
+and one product per window width (digits, decimal point) scores every
+(x, template) pair with zero-mean normalized correlation (TM_CCOEFF_NORMED). Peaks are picked with non-maximum suppression
+on the glyphs' ink spans, so touching or broken digits still decode.
+"""
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+MIN_TEXT_HEIGHT = 8
+SCORE_THRESHOLD = 0.45
+MAX_OVERLAP = 0.3      # accepted glyphs may share at most this much of the narrower ink span
+
+
+def render_line_glyphs(font_path, chars="0123456789.", font_size=64):
+    """
+    Renders every char at the same origin so they share a baseline, then crops
+    them to the digits' common row span and to their own ink columns.
+    returns: dict char -> uint8 glyph (all the same height)
+    """
+    font = ImageFont.truetype(font_path, font_size)
+    side = font_size * 2
+    rendered = {}
+    for char in chars:
+        img = Image.new('L', (side, side), 0)
+        ImageDraw.Draw(img).text((font_size // 3, font_size // 3), char, font=font, fill=255)
+        rendered[char] = np.array(img)
+
+    digit_rows = np.flatnonzero(np.any(np.stack([g for c, g in rendered.items() if c.isdigit()]) > 0, axis=(0, 2)))
+    top, bottom = digit_rows[0], digit_rows[-1] + 1
+    glyphs = {}
+    for char, img in rendered.items():
+        cols = np.flatnonzero(img[top:bottom].any(axis=0))
+        if len(cols):
+            glyphs[char] = img[top:bottom, cols[0]:cols[-1] + 1]
+    return glyphs
+
+
+def _unit_zero_mean(matrix):
+    matrix = matrix - matrix.mean(axis=1, keepdims=True)
+    norms = np.sqrt(np.einsum('ij,ij->i', matrix, matrix))
+    norms[norms == 0] = 1.0
+    return matrix / norms[:, None]
+
+
+class StripDecoder:
+    def __init__(self, glyphs, threshold=SCORE_THRESHOLD):
+        # glyphs: dict char -> uint8 glyph, all cropped to the same text height
+        self.glyphs = glyphs
+        self.chars = list(glyphs)
+        self.threshold = threshold
+        self._banks = {}
+
+    @classmethod
+    def from_font(cls, font_path, chars="0123456789.", font_size=64, **kwargs):
+        return cls(render_line_glyphs(font_path, chars, font_size), **kwargs)
+
+    def _bank(self, height):
+        """
+        Templates scaled to the strip's text height. Glyphs of about digit width
+        share one window width, narrow ones (the decimal point) get their own
+        tighter window so the neighbouring digits don't drown them out.
+        returns: list of (template indices, normalized matrix, window width),
+                 ink start (relative to the window center) and ink width per template
+        """
+        if height not in self._banks:
+            scaled = []
+            for char in self.chars:
+                glyph = self.glyphs[char]
+                width = max(1, round(glyph.shape[1] * height / glyph.shape[0]))
+                scaled.append(cv2.resize(glyph, (width, height), interpolation=cv2.INTER_AREA))
+            widths = np.array([g.shape[1] for g in scaled])
+            margin = max(1, height // 8)
+
+            wide = widths >= 0.6 * widths.max()
+            groups = [np.flatnonzero(wide)] + [np.array([i]) for i in np.flatnonzero(~wide)]
+            starts = np.zeros(len(scaled), dtype=np.int64)
+            bank = []
+            for indices in groups:
+                window = widths[indices].max() if len(indices) > 1 else widths[indices[0]] + 2 * margin
+                padded = np.zeros((len(indices), height, window), dtype=np.float32)
+                for row, i in enumerate(indices):
+                    offset = (window - widths[i]) // 2
+                    padded[row, :, offset:offset + widths[i]] = scaled[i]
+                    starts[i] = offset - window // 2
+                bank.append((indices, _unit_zero_mean(padded.reshape(len(indices), -1)), window))
+            self._banks[height] = (bank, starts, widths)
+        return self._banks[height]
+
+    def scores(self, mask):
+        """
+        mask: binary cell mask, white text on black
+        returns: (scores[x, template] with x the window center, bank) or (None, None) when empty
+        """
+        rows = np.flatnonzero(mask.any(axis=1))
+        if len(rows) == 0 or rows[-1] - rows[0] + 1 < MIN_TEXT_HEIGHT:
+            return None, None
+        strip = mask[rows[0]:rows[-1] + 1].astype(np.float32)
+        bank = self._bank(strip.shape[0])
+        width = strip.shape[1]
+
+        # Templates are zero mean, so only the window norms need the window mean:
+        # |w - mean|^2 = sum(w^2) - sum(w)^2 / n, from running column sums
+        col_sum = np.concatenate([[0.0], np.cumsum(strip.sum(axis=0, dtype=np.float64))])
+        col_sq = np.concatenate([[0.0], np.cumsum(np.einsum('ij,ij->j', strip, strip, dtype=np.float64))])
+
+        # Zero padded once for the widest window, so window i of every group is centered on column i
+        max_pad = max(window for _, _, window in bank[0]) // 2
+        padded = np.zeros((strip.shape[0], width + 2 * max_pad), dtype=np.float32)
+        padded[:, max_pad:max_pad + width] = strip
+        x = np.arange(width)
+
+        scores = np.empty((width, len(self.chars)), dtype=np.float32)
+        for indices, templates, window in bank[0]:
+            pad = window // 2
+            start = max_pad - pad
+            windows = np.lib.stride_tricks.sliding_window_view(
+                padded[:, start:start + width + window - 1], window, axis=1)
+            windows = windows.transpose(1, 0, 2)
+            lo = np.clip(x - pad, 0, width)
+            hi = np.clip(x - pad + window, 0, width)
+            total = col_sum[hi] - col_sum[lo]
+            var = col_sq[hi] - col_sq[lo] - total * total / templates.shape[1]
+            norms = np.sqrt(np.maximum(var, 0)).astype(np.float32)
+            norms[norms == 0] = 1.0
+            scores[:, indices] = (windows.reshape(width, -1) @ templates.T) / norms[:, None]
+        return scores, bank
+
+    def decode(self, mask):
+        # returns: decoded string, left to right
+        scores, bank = self.scores(mask)
+        if scores is None:
+            return ""
+        _, starts, widths = bank
+
+        best = scores.argmax(axis=1)
+        best_score = scores[np.arange(len(best)), best]
+
+        # Local maxima above the threshold are the candidates
+        padded = np.concatenate([[-np.inf], best_score, [-np.inf]])
+        peaks = np.flatnonzero((best_score >= self.threshold)
+                               & (best_score >= padded[:-2]) & (best_score > padded[2:]))
+
+        # Greedy non-maximum suppression on the ink span of each candidate
+        accepted = []
+        for x in peaks[np.argsort(-best_score[peaks], kind="stable")]:
+            t = best[x]
+            start = x + starts[t]
+            end = start + widths[t]
+            clear = True
+            for a_start, a_end, _ in accepted:
+                overlap = min(end, a_end) - max(start, a_start)
+                if overlap > MAX_OVERLAP * min(end - start, a_end - a_start):
+                    clear = False
+                    break
+            if clear:
+                accepted.append((start, end, self.chars[t]))
+
+        # A decimal point only counts between two digits, alone it is a noise speck
+        accepted.sort()
+        chars = [char for _, _, char in accepted]
+        return "".join(char for i, char in enumerate(chars)
+                       if char != "." or 0 < i < len(chars) - 1 and chars[i - 1] != "." and chars[i + 1] != ".")
+
+    def decode_all(self, masks):
+        return [self.decode(mask) for mask in masks]
+
+
+if __name__ == "__main__":
+    import time
+    from segmentation import segment
+
+    FONT_PATH = "Bourgeois-Book.otf"
+    decoder = StripDecoder.from_font(FONT_PATH)
+
+    # Digits rendered with tight tracking touch each other, contour segmentation sees one blob
+    font = ImageFont.truetype(FONT_PATH, 40)
+    for text in ["481", "1.5", "2207", "99"]:
+        img = Image.new('L', (147, 63), 0)
+        draw = ImageDraw.Draw(img)
+        x = 10
+        for char in text:
+            draw.text((x, 8), char, font=font, fill=255)
+            x += int(draw.textlength(char, font=font)) - 3
+        mask = np.array(img)
+        mask[mask > 0] = 255
+        print(f"{text!r}: strip {decoder.decode(mask)!r}, segmented glyphs {len(segment(mask))}")
+
+    masks = [mask] * 1000
+    start = time.perf_counter()
+    decoder.decode_all(masks)
+    print(f"{(time.perf_counter() - start) * 1000 / len(masks):.3f} ms per cell")
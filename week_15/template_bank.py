@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Compiled template banks live next to this file, one .npy (glyphs) + .json (metadata) each
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".template_cache")
+CACHE_VERSION = 1
+
+_font_hashes = {}
+
+
+def get_centered_char_image(image_array, target_size=(32, 32)):
+    # image_array: binary numpy array (white text on black)
+    # returns: 32x32 numpy array with centered character
+
+    h, w = image_array.shape
+    scale = min(target_size[0] / h, target_size[1] / w)
+    new_h, new_w = int(h * scale), int(w * scale)
+
+    resized = cv2.resize(image_array, (new_w, new_h), interpolation=cv2.INTER_AREA)
+
+    canvas = np.zeros(target_size, dtype=np.uint8)
+    y_off = (target_size[0] - new_h) // 2
+    x_off = (target_size[1] - new_w) // 2
+
+    canvas[y_off:y_off+new_h, x_off:x_off+new_w] = resized
+    return canvas
+
+
+def font_hash(font_path):
+    # sha256 of the font file, remembered per (path, size, mtime) so it is read once
+    st = os.stat(font_path)
+    memo_key = (os.path.abspath(font_path), st.st_size, st.st_mtime_ns)
+    if memo_key not in _font_hashes:
+        with open(font_path, "rb") as f:
+            _font_hashes[memo_key] = hashlib.sha256(f.read()).hexdigest()
+    return _font_hashes[memo_key]
+
+
+def bank_key(kind, font_path, chars, **params):
+    """
+    kind: name of the renderer, e.g. "mm" or "extract_digits"
+    params: everything else the glyphs depend on (font size, canvas size, shift, ...)
+    returns: (key, meta) where key changes whenever any input changes
+    """
+    meta = {
+        "version": CACHE_VERSION,
+        "kind": kind,
+        "font_sha256": font_hash(font_path),
+        "chars": chars,
+        "params": {k: list(v) if isinstance(v, tuple) else v for k, v in sorted(params.items())},
+    }
+    key = hashlib.sha256(json.dumps(meta, sort_keys=True).encode()).hexdigest()[:24]
+    return key, meta
+
+
+def _paths(key, cache_dir):
+    base = os.path.join(cache_dir, f"bank_{key}")
+    return base + ".npy", base + ".json"
+
+
+def load_bank(key, cache_dir=CACHE_DIR):
+    # returns: dict char -> glyph (memory-mapped, read-only), or None when not cached
+    npy_path, json_path = _paths(key, cache_dir)
+    if not (os.path.exists(npy_path) and os.path.exists(json_path)):
+        return None
+    try:
+        with open(json_path) as f:
+            stored = json.load(f)
+        glyphs = np.load(npy_path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if len(stored["bank_chars"]) != len(glyphs):
+        return None
+    return dict(zip(stored["bank_chars"], glyphs))
+
+
+def save_bank(key, meta, bank, cache_dir=CACHE_DIR):
+    # bank: dict char -> equally sized uint8 glyph
+    os.makedirs(cache_dir, exist_ok=True)
+    npy_path, json_path = _paths(key, cache_dir)
+    glyphs = np.stack(list(bank.values())) if bank else np.zeros((0, 0, 0), dtype=np.uint8)
+
+    # Write to temp files first so a crash never leaves a half written bank behind
+    with open(npy_path + ".tmp", "wb") as f:
+        np.save(f, glyphs)
+    with open(json_path + ".tmp", "w") as f:
+        json.dump(dict(meta, bank_chars=list(bank.keys())), f)
+    os.replace(npy_path + ".tmp", npy_path)
+    os.replace(json_path + ".tmp", json_path)
+
+
+def cached_bank(kind, font_path, chars, build, cache_dir=CACHE_DIR, **params):
+    """
+    Loads the compiled bank for these inputs, or calls build() once and stores it.
+    build: function returning dict char -> uint8 glyph
+    Raises IOError if the font file cannot be read.
+    """
+    key, meta = bank_key(kind, font_path, chars, **params)
+    bank = load_bank(key, cache_dir)
+    if bank is None:
+        bank = build()
+        try:
+            save_bank(key, meta, bank, cache_dir)
+        except OSError as e:
+            print(f"Warning: Could not write template cache: {e}")
+    return bank
+
+
+def render_templates(font_path, chars="0123456789.", font_size=64, canvas_size=(100, 100),
+                     origin=(20, 20), target_size=(32, 32)):
+    # Renders each char, crops it to its bounding box and normalizes it to target_size
+    font = ImageFont.truetype(font_path, font_size)
+
+    templates = {}
+    for char in chars:
+        # Draw char on PIL image
+        img = Image.new('L', canvas_size, 0)
+        draw = ImageDraw.Draw(img)
+        draw.text(origin, char, font=font, fill=255)
+
+        # Crop to bounding box
+        bbox = img.getbbox()
+        if bbox:
+            cropped = img.crop(bbox)
+            # Normalize to fixed size
+            templates[char] = get_centered_char_image(np.array(cropped), target_size)
+    return templates
+
+
+def load_templates(font_path, chars="0123456789.", font_size=64, canvas_size=(100, 100),
+                   origin=(20, 20), target_size=(32, 32), cache_dir=CACHE_DIR):
+    # render_templates(), but only rasterizes the font when the inputs changed
+    params = dict(font_size=font_size, canvas_size=canvas_size, origin=origin, target_size=target_size)
+    return cached_bank("mm", font_path, chars,
+                       lambda: render_templates(font_path, chars, **params),
+                       cache_dir=cache_dir, **params)
+
+
+def load_multi_templates(font_paths, sizes=(16, 24, 32, 48, 64), chars="0123456789.",
+                         target_size=(32, 32), cache_dir=CACHE_DIR):
+    """
+    Bank with one template per (font, size, char), for UIs that scale or mix fonts.
+    Fonts that cannot be loaded are skipped with a warning.
+    returns: list of (char, glyph) pairs, usable with CorrelationClassifier
+    """
+    entries = []
+    for font_path in font_paths:
+        for size in sizes:
+            # Canvas and origin scale with the font, same proportions as the 64px bank
+            side = int(size * 1.6) + 8
+            try:
+                bank = load_templates(font_path, chars, font_size=size, canvas_size=(side, side),
+                                      origin=(size // 3, size // 3), target_size=target_size,
+                                      cache_dir=cache_dir)
+            except IOError:
+                print(f"Warning: Could not load {font_path}, skipping it.")
+                break
+            entries.extend(bank.items())
+    return entries
@@ -0,0 +1,63 @@
+import numpy as np
+import pytesseract
+
+# Gap between tiles, wide enough that tesseract never joins two cells into one word / line
+TILE_PADDING = 24
+TESSERACT_CONFIG = r'--psm 6 -c tessedit_char_whitelist=0123456789.'
+
+
+def build_montage(masks, padding=TILE_PADDING):
+    """
+    Stacks the masks (white text on black) into one column, one cell per line,
+    as black text on white for tesseract.
+    returns: (montage, boxes) with boxes[i] = (top, bottom) rows of mask i
+    """
+    width = max(m.shape[1] for m in masks) + 2 * padding
+    height = sum(m.shape[0] for m in masks) + (len(masks) + 1) * padding
+    montage = np.full((height, width), 255, dtype=np.uint8)
+
+    boxes = []
+    top = padding
+    for mask in masks:
+        h, w = mask.shape
+        montage[top:top + h, padding:padding + w] = 255 - mask
+        boxes.append((top, top + h))
+        top += h + padding
+    return montage, boxes
+
+
+def read_masks_with_tesseract(masks, config=TESSERACT_CONFIG):
+    """
+    One tesseract run for all masks instead of one process per mask.
+    masks: list of binary masks (white text on black)
+    returns: list of detected strings (digits and dots), same order as masks
+    """
+    if not masks:
+        return []
+    montage, boxes = build_montage(masks)
+    try:
+        data = pytesseract.image_to_data(montage, config=config, output_type=pytesseract.Output.DICT)
+    except pytesseract.TesseractNotFoundError:
+        print("Error: Tesseract is not installed or not in PATH.")
+        return [""] * len(masks)
+
+    # Words go to the tile that contains their vertical center, then left to right
+    words = [[] for _ in masks]
+    tops = np.array([b[0] for b in boxes])
+    for text, left, top, height in zip(data["text"], data["left"], data["top"], data["height"]):
+        text = ''.join(filter(lambda x: x.isdigit() or x == '.', text))
+        if not text:
+            continue
+        center = top + height / 2
+        idx = int(np.searchsorted(tops, center, side="right")) - 1
+        if 0 <= idx < len(boxes) and center < boxes[idx][1] + TILE_PADDING / 2:
+            words[idx].append((left, text))
+
+    return [''.join(text for _, text in sorted(cell_words)) for cell_words in words]
+
+
+def read_board_with_tesseract(mask_grid):
+    # mask_grid[row_idx][col_idx] -> values[row_idx][col_idx]
+    flat = [mask for row in mask_grid for mask in row]
+    values = iter(read_masks_with_tesseract(flat))
+    return [[next(values) for _ in row] for row in mask_grid]
@@ -0,0 +1,166 @@
+"""
+Per-stage timing for the reader pipeline.
+
+A PipelineTimer is passed to ScoreboardReader(timing=...). The pipeline calls
+start() at the beginning of a cycle and lap(stage) after each stage, which
+records the time since the previous lap. end_cycle() records the cycle's
+end-to-end latency and, every write_every seconds, dumps snapshot() to a
+JSON file. With timing=None every hook is a skipped `if`, nothing else runs.
+
+Durations go into log-bucketed histograms (constant memory, about 6%
+resolution), so p50 / p95 / p99 cover the whole run, not a window.
+
+FixedRate is the fixed schedule every capture loop (run(), Pipeline,
+frame_bus.serve(), MultiMonitorCapture) sleeps on.
+"""
+import json
+import math
+import os
+import time
+
+MIN_SECONDS = 1e-7
+BUCKETS_PER_DECADE = 40
+DECADES = 9  # 100 ns .. 100 s
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (BUCKETS_PER_DECADE * DECADES + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        idx = int(math.log10(max(seconds, MIN_SECONDS) / MIN_SECONDS) * BUCKETS_PER_DECADE)
+        self.counts[min(idx, len(self.counts) - 1)] += 1
+
+    def percentile(self, q):
+        # q: 0..100, returns seconds (geometric middle of the bucket, at most max)
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for idx, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min(self.max, MIN_SECONDS * 10 ** ((idx + 0.5) / BUCKETS_PER_DECADE))
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1000,
+            "p95_ms": self.percentile(95) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class FixedRate:
+    """
+    Drift-free schedule: each deadline is the previous one plus the period,
+    not "now" plus the period, so time spent working doesn't add up. The
+    period may change between calls (idle / active rate).
+    """
+
+    def __init__(self):
+        self.deadline = time.perf_counter()
+        self.missed = 0
+
+    def wait(self, period, stop=None):
+        """
+        Sleeps until the next deadline (stop: threading.Event, waited on instead of sleeping)
+        returns: how many deadlines were missed since the previous call
+        """
+        self.deadline += period
+        missed = 0
+        now = time.perf_counter()
+        if now > self.deadline:
+            # Skip the slots we overran instead of bursting to catch up
+            missed = int((now - self.deadline) // period) + 1
+            self.missed += missed
+            self.deadline += missed * period
+        delay = max(0.0, self.deadline - time.perf_counter())
+        if stop is not None:
+            stop.wait(delay)
+        else:
+            time.sleep(delay)
+        return missed
+
+
+class PipelineTimer:
+    """
+    stats_path: JSON file rewritten with snapshot() every write_every seconds (None = never)
+
+    Stages recorded by ScoreboardReader: grab, mask, change_check, segment,
+    glyph_cache, normalize, match, decode, tesseract, pool, store, archive,
+    save (cv2.imwrite), plus "cycle" (end to end) and "cell" (recognition
+    time per recognized cell).
+    """
+
+    def __init__(self, stats_path=None, write_every=5.0):
+        self.stats_path = stats_path
+        self.write_every = write_every
+        self.histograms = {}
+        self.cycles = 0
+        self._cycle_start = 0.0
+        self._last = 0.0
+        self._next_write = time.monotonic() + write_every
+
+    def start(self):
+        self._cycle_start = self._last = time.perf_counter()
+
+    def split(self):
+        # Time since the previous lap (or start), restarts the lap clock without recording it
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+        return elapsed
+
+    def lap(self, stage):
+        # Time since the previous lap (or start) goes to `stage`
+        self.add(stage, self.split())
+
+    def add(self, stage, seconds):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = LatencyHistogram()
+        histogram.add(seconds)
+
+    def end_cycle(self):
+        now = time.perf_counter()
+        self.add("cycle", now - self._cycle_start)
+        self._last = now
+        self.cycles += 1
+        if self.stats_path and time.monotonic() >= self._next_write:
+            self.write()
+
+    def snapshot(self):
+        return {
+            "cycles": self.cycles,
+            "stages": {stage: h.summary() for stage, h in self.histograms.items()},
+        }
+
+    def write(self, path=None):
+        path = path or self.stats_path
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(dict(self.snapshot(), time=time.time()), f, indent=2)
+        os.replace(tmp, path)
+        self._next_write = time.monotonic() + self.write_every
+
+    def reset(self):
+        self.histograms = {}
+        self.cycles = 0
+
+    def format(self):
+        lines = [f"{'stage':<14}{'count':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)"]
+        for stage, s in self.snapshot()["stages"].items():
+            lines.append(f"{stage:<14}{s['count']:>8}{s['mean_ms']:>10.3f}{s['p50_ms']:>10.3f}"
+                         f"{s['p95_ms']:>10.3f}{s['p99_ms']:>10.3f}")
+        return "\n".join(lines)
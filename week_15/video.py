@@ -0,0 +1,242 @@
+"""
+Scoreboard timelines from recorded match videos.
+
+VideoSource decodes on a background thread into a bounded queue (the decoder
+waits when the reader falls behind, nothing is dropped), samples every n-th
+frame or one frame per `every` seconds, crops the board region and converts
+only that to BGRA. Skipped frames are grab()bed but never retrieved.
+timeline() runs the sampled frames through ScoreboardReader.read_frame() and
+yields stream.Readings stamped with the video time.
+
+    python video.py match.mp4 --every 1 --changes --out timeline.ndjson
+"""
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+
+import mm
+from layout import DEFAULT_LAYOUT, REFERENCE_IMAGE, locate_board
+from stream import NdjsonWriter, changes, to_reading
+
+# time: seconds from the start of the video, index: frame number
+VideoFrame = namedtuple("VideoFrame", ["time", "index", "frame"])
+
+_END = object()
+
+
+class VideoSource:
+    """
+    path: anything cv2.VideoCapture opens
+    stride: keep every stride-th frame; every: or one frame per that many seconds
+    start / end: seconds, end=None reads to the end; seek() moves start
+    region: mss style dict to crop to (left / top in video pixels), None = whole frame
+    seek_after: jump with CAP_PROP_POS_FRAMES instead of grabbing when the next
+                sample is more than this many frames ahead (None = always grab,
+                seeking is only faster for codecs with frequent keyframes)
+    """
+
+    def __init__(self, path, stride=1, every=None, start=0.0, end=None, region=None,
+                 queue_size=32, seek_after=None):
+        self.path = path
+        self.stride = max(1, stride)
+        self.every = every
+        self.start = start
+        self.end = end
+        self.region = region
+        self.queue_size = queue_size
+        self.seek_after = seek_after
+
+        self._cap = cv2.VideoCapture(path)
+        if not self._cap.isOpened():
+            raise IOError(f"Could not open video {path}")
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_count = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.duration = self.frame_count / self.fps if self.frame_count > 0 else None
+
+        self.decoded = 0
+        self.skipped = 0
+        self.seeks = 0
+        self._queue = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample_step(self):
+        # frames from one sample to the next
+        if self.every:
+            return max(1.0, self.every * self.fps)
+        return float(self.stride)
+
+    def _crop(self, frame):
+        if self.region is not None:
+            r = self.region
+            frame = frame[r["top"]:r["top"] + r["height"], r["left"]:r["left"] + r["width"]]
+        # The reader wants contiguous BGRA, convert the crop only
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _decode(self):
+        cap = self._cap
+        index = int(round(self.start * self.fps))
+        # Always rewind: after a previous pass the capture sits wherever that one stopped
+        cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        if index:
+            self.seeks += 1
+        last_index = int(self.end * self.fps) if self.end is not None else None
+        step = self._sample_step()
+        next_sample = float(index)
+
+        try:
+            while not self._stop.is_set():
+                target = int(round(next_sample))
+                if last_index is not None and target > last_index:
+                    return
+                if self.seek_after is not None and target - index > self.seek_after:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                    self.seeks += 1
+                    index = target
+                while index < target:
+                    if not cap.grab():
+                        return
+                    self.skipped += 1
+                    index += 1
+                ok, frame = cap.read()
+                if not ok:
+                    return
+                self.decoded += 1
+                if not self._put(VideoFrame(index / self.fps, index, self._crop(frame))):
+                    return
+                index += 1
+                next_sample += step
+        finally:
+            self._put(_END)
+
+    def _start(self):
+        self._stop.clear()
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._thread = threading.Thread(target=self._decode, name="video-decode", daemon=True)
+        self._thread.start()
+
+    def _halt(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def first_frame(self):
+        # Full BGR frame at `start`, for calibration; call before iterating
+        self._halt()
+        self._cap.set(cv2.CAP_PROP_POS_MSEC, self.start * 1000)
+        ok, frame = self._cap.read()
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return frame if ok else None
+
+    def seek(self, seconds):
+        # Next iteration starts at `seconds`, a running one is stopped
+        self._halt()
+        self.start = seconds
+
+    def __iter__(self):
+        # yields: VideoFrame per sample, frames are BGRA crops of `region`
+        self._halt()
+        self._start()
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                self._thread.join()
+                self._thread = None
+                return
+            yield item
+
+    def close(self):
+        self._halt()
+        self._cap.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self):
+        return {"decoded": self.decoded, "skipped": self.skipped, "seeks": self.seeks,
+                "queued": self._queue.qsize() if self._queue is not None else 0}
+
+
+def video_placement(source, layout=DEFAULT_LAYOUT, reference=None):
+    """
+    Where the board is in the video: the layout scaled to the video size, or,
+    with a reference board image, located in the first frame (see layout.py).
+    returns: layout.Placement in video pixels
+    """
+    screen = {"left": 0, "top": 0, "width": source.width, "height": source.height}
+    if reference is None:
+        return layout.place(screen)
+    if isinstance(reference, str):
+        path = reference
+        reference = cv2.imread(path, cv2.IMREAD_GRAYSCALE) if os.path.exists(path) else None
+        if reference is None:
+            print(f"Warning: no readable board reference at {path}, using the scaled layout.")
+            return layout.place(screen)
+    frame = source.first_frame()
+    found = locate_board(frame, reference, source.height / layout.reference_size[1]) if frame is not None else None
+    if found is None:
+        print("Warning: board not found in the first frame, using the scaled layout.")
+        return layout.place(screen)
+    x, y, scale, _ = found
+    return layout.place_scaled(screen, x, y, scale)
+
+
+def timeline(source, reader=None, **reader_kwargs):
+    """
+    source: VideoSource; its region is set to the reader's board region
+    reader: ScoreboardReader placed in video pixels, default: video_placement(source)
+    yields: stream.Reading per sampled frame, time = seconds into the video
+    """
+    if reader is None:
+        reader = mm.ScoreboardReader(*video_placement(source), **reader_kwargs)
+    source.region = reader.region
+    for cycle, sample in enumerate(source, start=1):
+        yield to_reading(reader.read_frame(sample.frame), cycle, sample.time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract a scoreboard timeline from a video")
+    parser.add_argument("video")
+    parser.add_argument("--every", type=float, default=1.0, help="seconds between samples (0 = use --stride)")
+    parser.add_argument("--stride", type=int, default=1, help="keep every n-th frame")
+    parser.add_argument("--start", type=float, default=0.0)
+    parser.add_argument("--end", type=float)
+    parser.add_argument("--calibrate", action="store_true", help=f"locate the board with {REFERENCE_IMAGE}")
+    parser.add_argument("--changes", action="store_true", help="write only cell change events")
+    parser.add_argument("--out", default="-", help="NDJSON file, - for stdout")
+    args = parser.parse_args()
+
+    with VideoSource(args.video, stride=args.stride, every=args.every or None,
+                     start=args.start, end=args.end) as source:
+        reader = mm.ScoreboardReader(*video_placement(source, reference=REFERENCE_IMAGE if args.calibrate else None))
+        started = time.perf_counter()
+        events = timeline(source, reader)
+        if args.changes:
+            events = changes(events)
+        with NdjsonWriter(args.out) as writer:
+            writer.write_all(events)
+        elapsed = time.perf_counter() - started
+        video_seconds = (source.decoded + source.skipped) / source.fps
+        print(f"{source.decoded} samples from {video_seconds:.0f} s of video in {elapsed:.1f} s "
+              f"({video_seconds / max(elapsed, 1e-9):.0f}x real time)", file=sys.stderr)